@@ -0,0 +1,258 @@
+"""Shortest paths and random walks of ants on the vertices of a graph.
+
+``PathTable`` precomputes every shortest path of a graph once, so a path or a
+distance is a table lookup. ``simulate_meetings`` runs many pairs of random
+walks at once as NumPy arrays, to estimate how soon two ants meet.
+
+Run it headless, from the repository root::
+
+    python animations/ant_walks.py --graph cube --walks 1000000
+    python animations/ant_walks.py --graph hypercube --dim 6 --start random
+    python animations/ant_walks.py --graph dodecahedron --within 5 10 20
+"""
+
+import argparse
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Edge = Tuple[int, int]
+
+
+@dataclass
+class Graph:
+    """An undirected graph on vertices ``0 .. n - 1``, with a position for each vertex."""
+
+    positions: np.ndarray
+    edges: List[Edge]
+
+    @property
+    def size(self) -> int:
+        return len(self.positions)
+
+    def neighbors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the neighbors of each vertex as an ``(n, max_degree)`` array,
+        padded with -1, and the degree of each vertex.
+        """
+        adjacent: List[List[int]] = [[] for _ in range(self.size)]
+        for i, j in self.edges:
+            adjacent[i].append(j)
+            adjacent[j].append(i)
+        degrees = np.array([len(a) for a in adjacent])
+        table = np.full((self.size, degrees.max(initial=0)), -1, dtype=np.int64)
+        for i, a in enumerate(adjacent):
+            table[i, :len(a)] = a
+        return table, degrees
+
+
+def graph_from_positions(positions) -> Graph:
+    """Return the graph of a convex polytope's vertices, joining the pairs at the shortest distance (its edges)."""
+    positions = np.asarray(positions, dtype=float)
+    distances = np.linalg.norm(positions[:, None] - positions[None, :], axis=-1)
+    shortest = distances[np.triu_indices(len(positions), 1)].min()
+    i, j = np.nonzero(np.triu(np.isclose(distances, shortest), 1))
+    return Graph(positions, list(zip(i.tolist(), j.tolist())))
+
+
+def hypercube_graph(dim: int) -> Graph:
+    """Return the ``dim``-dimensional hypercube: vertices are bit patterns, edges flip one bit."""
+    positions = np.array(list(itertools.product((0.0, 1.0), repeat=dim)))[:, ::-1]
+    edges = [(v, v ^ (1 << bit)) for v in range(2 ** dim) for bit in range(dim) if v < v ^ (1 << bit)]
+    return Graph(positions, edges)
+
+
+_PHI = (1 + 5 ** 0.5) / 2
+
+
+def _signs(*coordinates) -> List[Tuple[float, ...]]:
+    """Every sign combination of ``coordinates``, zeros left as they are."""
+    options = [(c, -c) if c else (c,) for c in coordinates]
+    return list(itertools.product(*options))
+
+
+def _cyclic(points) -> List[Tuple[float, ...]]:
+    return [p[i:] + p[:i] for p in points for i in range(3)]
+
+
+POLYHEDRA = {
+    "tetrahedron": lambda: [(1, 1, 1), (1, -1, -1), (-1, 1, -1), (-1, -1, 1)],
+    "cube": lambda: _signs(1, 1, 1),
+    "octahedron": lambda: _cyclic(_signs(1, 0, 0)),
+    "dodecahedron": lambda: _signs(1, 1, 1) + _cyclic(_signs(0, 1 / _PHI, _PHI)),
+    "icosahedron": lambda: _cyclic(_signs(0, 1, _PHI)),
+}
+
+
+def polyhedron_graph(name: str) -> Graph:
+    """Return the graph of a Platonic solid, one of ``POLYHEDRA``."""
+    return graph_from_positions(POLYHEDRA[name]())
+
+
+class PathTable:
+    """
+    All-pairs shortest paths of a graph, weighted by the Euclidean length of
+    its edges, computed once.
+
+    Graphs whose edges all have the same length (polyhedra, hypercubes) are
+    searched breadth first, one matrix product per distance; others with a
+    vectorized Floyd–Warshall.
+    """
+
+    def __init__(self, graph: Graph):
+        n = graph.size
+        self.graph = graph
+        i, j = np.array(graph.edges, dtype=np.int64).reshape(-1, 2).T
+        lengths = np.linalg.norm(graph.positions[i] - graph.positions[j], axis=-1)
+        # next_hop[i, j]: the vertex after i on a shortest path from i to j
+        self.next_hop = np.full((n, n), -1, dtype=np.int64)
+        np.fill_diagonal(self.next_hop, np.arange(n))
+        if len(lengths) and np.allclose(lengths, lengths[0]):
+            self.distances = self._breadth_first(i, j) * lengths[0]
+        else:
+            self._floyd_warshall(i, j, lengths)
+
+    def _breadth_first(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        n = self.graph.size
+        adjacency = np.zeros((n, n), dtype=np.float32)
+        adjacency[i, j] = adjacency[j, i] = 1
+        hops = np.full((n, n), np.inf)
+        np.fill_diagonal(hops, 0)
+        reached = np.eye(n, dtype=bool)
+        frontier = reached.copy()
+        for distance in range(1, n):
+            # Row s of the frontier: the vertices first reached from s at this distance
+            frontier = ((frontier.astype(np.float32) @ adjacency) > 0) & ~reached
+            if not frontier.any():
+                break
+            hops[frontier] = distance
+            reached |= frontier
+        # The next hop from s to t is a neighbor of s one hop closer to t
+        neighbors, _ = self.graph.neighbors()
+        for slot in neighbors.T:
+            closer = (slot[:, None] >= 0) & np.isfinite(hops) & (hops[slot] == hops - 1) & (self.next_hop < 0)
+            self.next_hop[closer] = np.broadcast_to(slot[:, None], hops.shape)[closer]
+        return hops
+
+    def _floyd_warshall(self, i: np.ndarray, j: np.ndarray, lengths: np.ndarray) -> None:
+        n = self.graph.size
+        self.distances = np.full((n, n), np.inf)
+        np.fill_diagonal(self.distances, 0.0)
+        self.distances[i, j] = self.distances[j, i] = lengths
+        self.next_hop[i, j], self.next_hop[j, i] = j, i
+        for k in range(n):
+            through_k = self.distances[:, k, None] + self.distances[None, k, :]
+            shorter = through_k < self.distances - 1e-12
+            np.copyto(self.distances, through_k, where=shorter)
+            np.copyto(self.next_hop, np.broadcast_to(self.next_hop[:, k, None], (n, n)), where=shorter)
+
+    def path(self, start: int, end: int) -> List[int]:
+        """Return the vertices of a shortest path from ``start`` to ``end``, both included."""
+        if self.next_hop[start, end] < 0:
+            raise ValueError(f"No path from {start} to {end}")
+        path = [start]
+        while path[-1] != end:
+            path.append(int(self.next_hop[path[-1], end]))
+        return path
+
+    def distance(self, start: int, end: int) -> float:
+        return float(self.distances[start, end])
+
+    def farthest_pair(self) -> Tuple[int, int]:
+        """Return two vertices at the greatest distance, e.g. opposite corners of a cube."""
+        i, j = np.unravel_index(np.argmax(np.where(np.isfinite(self.distances), self.distances, -1)), self.distances.shape)
+        return int(i), int(j)
+
+
+def simulate_meetings(
+    graph: Graph,
+    walks: int,
+    max_steps: int = 1000,
+    starts: Optional[Tuple[int, int]] = None,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Walk ``walks`` pairs of ants at random, all at once, and return when
+    each pair met, in moves.
+
+    Both ants of a pair move at every step, each to a neighbor of its vertex
+    chosen uniformly. They meet when they reach the same vertex (at the time
+    of that move) or cross on an edge (half a move earlier).
+
+    :param starts: Start vertices of the two ants (default: random distinct
+        vertices for each pair)
+    :return: Meeting times, ``inf`` for the pairs that had not met after
+        ``max_steps`` moves
+    """
+    rng = np.random.default_rng(seed)
+    neighbors, degrees = graph.neighbors()
+    if starts is None:
+        first = rng.integers(graph.size, size=walks)
+        # Offset by 1 .. n-1, so the second ant never starts on the first
+        second = (first + rng.integers(1, graph.size, size=walks)) % graph.size
+    else:
+        first, second = np.full(walks, starts[0]), np.full(walks, starts[1])
+    times = np.full(walks, np.inf)
+    times[first == second] = 0.0
+
+    # Only the pairs still walking are kept in the arrays
+    active = np.nonzero(first != second)[0]
+    a, b = first[active], second[active]
+    for step in range(1, max_steps + 1):
+        if not len(active):
+            break
+        next_a = neighbors[a, (rng.random(len(a)) * degrees[a]).astype(np.int64)]
+        next_b = neighbors[b, (rng.random(len(b)) * degrees[b]).astype(np.int64)]
+        crossed = (next_a == b) & (next_b == a)
+        met = next_a == next_b
+        times[active[crossed]] = step - 0.5
+        times[active[met]] = step
+        walking = ~(met | crossed)
+        active, a, b = active[walking], next_a[walking], next_b[walking]
+    return times
+
+
+def meeting_statistics(times: np.ndarray, within: Sequence[int] = (5, 10, 20)) -> Dict[str, float]:
+    """Summarize meeting times: probabilities of meeting within some moves, mean and median."""
+    met = np.isfinite(times)
+    stats = {f"p_within_{k}": float(np.mean(times <= k)) for k in within}
+    stats["p_met"] = float(met.mean())
+    if met.any():
+        stats["mean_time"] = float(times[met].mean())
+        # Standard error of the mean, to judge the number of walks
+        stats["mean_time_stderr"] = float(times[met].std(ddof=1) / np.sqrt(met.sum())) if met.sum() > 1 else float("nan")
+        stats["median_time"] = float(np.median(times[met]))
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--graph", choices=sorted(POLYHEDRA) + ["hypercube"], default="cube")
+    parser.add_argument("--dim", type=int, default=4, help="hypercube dimension")
+    parser.add_argument("--walks", type=int, default=1000000, help="pairs of ants simulated")
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--start", choices=["farthest", "random"], default="farthest", help="start vertices of each pair")
+    parser.add_argument("--within", type=int, nargs="+", default=[5, 10, 20], help="move counts to report meeting probabilities for")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    graph = hypercube_graph(args.dim) if args.graph == "hypercube" else polyhedron_graph(args.graph)
+    start = time.perf_counter()
+    table = PathTable(graph)
+    starts = table.farthest_pair() if args.start == "farthest" else None
+    print(f"{graph.size} vertices, {len(graph.edges)} edges, paths in {time.perf_counter() - start:.3f}s")
+    if starts is not None:
+        print(f"start at {starts}, {len(table.path(*starts)) - 1} edges apart")
+
+    start = time.perf_counter()
+    times = simulate_meetings(graph, args.walks, args.max_steps, starts, args.seed)
+    print(f"{args.walks} walks in {time.perf_counter() - start:.2f}s")
+    for name, value in meeting_statistics(times, args.within).items():
+        print(f"{name:<18} {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 from manim import *
 import random
-import networkx as nx
 from typing import List, Tuple
+from ant_walks import Graph, PathTable, meeting_statistics, simulate_meetings
 
 class CubeAntsAnimation(ThreeDScene):
+    # Pairs of ants whose random walks are simulated for the closing statistics
+    SIMULATED_WALKS = 1_000_000
+    # Move counts the probability of having met is shown for
+    MEETING_WITHIN = (5, 10, 20)
+    # Fixed, so that renders of the scene are identical
+    SIMULATION_SEED = 0
+
     def construct(self):
         # Create a 3D cube with edge length 3
         cube = Cube(side_length=3, fill_opacity=0.2, stroke_width=3)
@@ -27,9 +34,8 @@ class CubeAntsAnimation(ThreeDScene):
             (0, 4), (1, 5), (2, 6), (3, 7)   # Connecting edges
         ]
         
-        # Create a graph for pathfinding
-        self.graph = nx.Graph()
-        self.graph.add_edges_from(edges)
+        # Every shortest path between vertices, computed once
+        self.paths = PathTable(Graph(np.array(vertices), edges))
         
         # Place 8 ants on the vertices with different colors
         ant_colors = [RED, BLUE, GREEN, YELLOW, PURPLE, ORANGE, PINK, TEAL]
@@ -102,14 +108,18 @@ class CubeAntsAnimation(ThreeDScene):
                     ant.animate.move_to(random.choice(edge_centers))
                     for ant in ants
                 ])
+
+        # Close with how soon two wandering ants meet
+        self.show_meeting_statistics(ants)
     
     def find_shortest_path(self, ant1: Mobject, ant2: Mobject, vertices: List[np.ndarray], edge_centers: List[np.ndarray]) -> List[int]:
         # Find the closest vertices to the ants
-        start = min(range(len(vertices)), key=lambda i: np.linalg.norm(ant1.get_center() - vertices[i]))
-        end = min(range(len(vertices)), key=lambda i: np.linalg.norm(ant2.get_center() - vertices[i]))
+        corners = np.array(vertices)
+        start = int(np.argmin(np.linalg.norm(corners - ant1.get_center(), axis=1)))
+        end = int(np.argmin(np.linalg.norm(corners - ant2.get_center(), axis=1)))
         
-        # Find the shortest path using networkx
-        return nx.shortest_path(self.graph, start, end)
+        # Look the shortest path up in the precomputed table
+        return self.paths.path(start, end)
 
     def highlight_path(self, path: List[int], vertices: List[np.ndarray]) -> List[Line]:
         highlighted_edges = []
@@ -120,10 +130,27 @@ class CubeAntsAnimation(ThreeDScene):
         return highlighted_edges
 
     def calculate_path_distance(self, path: List[int], vertices: List[np.ndarray]) -> float:
-        distance = 0
-        for i in range(len(path) - 1):
-            start, end = vertices[path[i]], vertices[path[i+1]]
-            distance += np.linalg.norm(end - start)
-        return distance
+        return self.paths.distance(path[0], path[-1])
+
+    def show_meeting_statistics(self, ants: VGroup) -> None:
+        # Two ants start at opposite corners and move along a random edge at
+        # every step; a million such walks are simulated at once
+        starts = self.paths.farthest_pair()
+        times = simulate_meetings(self.paths.graph, self.SIMULATED_WALKS, starts=starts, seed=self.SIMULATION_SEED)
+        stats = meeting_statistics(times, self.MEETING_WITHIN)
+
+        lines = [Text(f"{self.SIMULATED_WALKS:,} random walks from opposite corners", font_size=24)]
+        lines += [
+            Text(f"Met within {k} moves: {stats[f'p_within_{k}']:.1%}", font_size=22)
+            for k in self.MEETING_WITHIN
+        ]
+        lines.append(Text(f"Average meeting time: {stats['mean_time']:.2f} moves", font_size=22, color=YELLOW))
+        panel = VGroup(*lines).arrange(DOWN, aligned_edge=LEFT, buff=0.2).to_corner(UL)
+
+        # Kept facing the camera
+        self.add_fixed_in_frame_mobjects(panel)
+        self.remove(panel)
+        self.play(FadeOut(ants), Write(panel), run_time=2)
+        self.wait(3)
 
 # The file now ends here, removing the if __name__ == "__main__": block
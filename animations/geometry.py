@@ -0,0 +1,146 @@
+"""Vectorized plane geometry for the scenes.
+
+Every function takes points as arrays of shape ``(..., 2)`` or ``(..., 3)``
+(manim points, whose z coordinate is ignored) and works on any number of
+configurations at once: pass ``(n, 3)`` arrays to compute ``n`` circumcircles
+in one call. Points are returned with the dimension of the first argument.
+Degenerate inputs (collinear points, circles that do not meet) give NaN
+rather than raising, so a batch can be filtered afterwards with
+``np.isfinite``.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def _xy(points) -> np.ndarray:
+    return np.asarray(points, dtype=float)[..., :2]
+
+
+def _lift(xy: np.ndarray, like) -> np.ndarray:
+    """Give 2D points ``xy`` the dimension of ``like`` (a zero z for 3D points)."""
+    if np.shape(like)[-1] == 3:
+        return np.concatenate([xy, np.zeros(xy.shape[:-1] + (1,))], axis=-1)
+    return xy
+
+
+def _cross(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def _dot(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return np.einsum("...i,...i->...", u, v)
+
+
+def circumcircle(a, b, c) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the center and radius of the circle through ``a``, ``b`` and ``c``."""
+    a_xy = _xy(a)
+    ab, ac = _xy(b) - a_xy, _xy(c) - a_xy
+    d = 2 * _cross(ab, ac)
+    ab2, ac2 = _dot(ab, ab), _dot(ac, ac)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.stack([ac[..., 1] * ab2 - ab[..., 1] * ac2, ab[..., 0] * ac2 - ac[..., 0] * ab2], axis=-1) / d[..., None]
+    offset = np.where((d != 0)[..., None], offset, np.nan)
+    return _lift(a_xy + offset, a), np.linalg.norm(offset, axis=-1)
+
+
+def circle_intersections(center1, radius1, center2, radius2) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the two intersection points of two circles, left and right of the
+    line from ``center1`` to ``center2``; NaN where the circles do not meet.
+    """
+    c1, c2 = _xy(center1), _xy(center2)
+    r1, r2 = np.asarray(radius1, dtype=float), np.asarray(radius2, dtype=float)
+    delta = c2 - c1
+    d = np.linalg.norm(delta, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        along = (r1 ** 2 - r2 ** 2 + d ** 2) / (2 * d)
+        h = np.sqrt(r1 ** 2 - along ** 2)
+        unit = delta / d[..., None]
+    base = c1 + along[..., None] * unit
+    normal = np.stack([-unit[..., 1], unit[..., 0]], axis=-1)
+    return _lift(base + h[..., None] * normal, center1), _lift(base - h[..., None] * normal, center1)
+
+
+def reflect(point, line_start, line_end) -> np.ndarray:
+    """Return the mirror image of ``point`` across the line through ``line_start`` and ``line_end``."""
+    p, s = _xy(point), _xy(line_start)
+    direction = _xy(line_end) - s
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = _dot(p - s, direction) / _dot(direction, direction)
+    foot = s + t[..., None] * direction
+    return _lift(2 * foot - p, point)
+
+
+def line_intersection(p1, p2, p3, p4) -> np.ndarray:
+    """Return where line ``p1 p2`` meets line ``p3 p4``; NaN for parallel lines."""
+    a, c = _xy(p1), _xy(p3)
+    u, v = _xy(p2) - a, _xy(p4) - c
+    den = _cross(u, v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(den != 0, _cross(c - a, v) / den, np.nan)
+    return _lift(a + t[..., None] * u, p1)
+
+
+def points_on_sides(a, b, c, ratios) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the points P on BC, Q on CA and R on AB dividing the sides at
+    ``ratios`` (shape ``(..., 3)``), e.g. P = B + (C - B) * ratios[..., 0].
+    """
+    a, b, c = (np.asarray(x, dtype=float) for x in (a, b, c))
+    t = np.asarray(ratios, dtype=float)[..., None]
+    return b + (c - b) * t[..., 0, :], c + (a - c) * t[..., 1, :], a + (b - a) * t[..., 2, :]
+
+
+def miquel_point(a, b, c, p, q, r) -> np.ndarray:
+    """
+    Return the Miquel point of triangle ABC with P on BC, Q on CA and R on
+    AB: the common point of circles AQR, BRP and CPQ.
+
+    Computed as the second intersection of circles AQR and BRP, which both
+    pass through R: the mirror image of R across the line of their centers.
+    """
+    center1, _ = circumcircle(a, q, r)
+    center2, _ = circumcircle(b, r, p)
+    return _lift(_xy(reflect(r, center1, center2)), a)
+
+
+def concyclic_residual(x, a, b, c) -> np.ndarray:
+    """Return how far ``x`` is from the circle through ``a``, ``b`` and ``c``, relative to its radius."""
+    center, radius = circumcircle(a, b, c)
+    return np.abs(np.linalg.norm(_xy(x) - _xy(center), axis=-1) - radius) / radius
+
+
+def angle_of(v) -> np.ndarray:
+    """Return the direction of vectors ``v`` in radians, in (-pi, pi]."""
+    v = _xy(v)
+    return np.arctan2(v[..., 1], v[..., 0])
+
+
+def angle_between(v1, v2) -> np.ndarray:
+    """Return the unsigned angle between vectors ``v1`` and ``v2``, in [0, pi]."""
+    u, v = _xy(v1), _xy(v2)
+    # Accurate for nearly (anti)parallel vectors, unlike arccos of the dot product
+    return np.arctan2(np.abs(_cross(u, v)), _dot(u, v))
+
+
+def interior_angles(a, b, c) -> np.ndarray:
+    """Return the angles of triangles ABC at A, B and C, as an array of shape ``(..., 3)``."""
+    a, b, c = _xy(a), _xy(b), _xy(c)
+    return np.stack([angle_between(b - a, c - a), angle_between(c - b, a - b), angle_between(a - c, b - c)], axis=-1)
+
+
+def angle_bisector(vertex, p1, p2) -> np.ndarray:
+    """Return the unit vector bisecting angle ``p1 vertex p2``."""
+    o = _xy(vertex)
+    u, v = _xy(p1) - o, _xy(p2) - o
+    bisector = u / np.linalg.norm(u, axis=-1, keepdims=True) + v / np.linalg.norm(v, axis=-1, keepdims=True)
+    return _lift(bisector / np.linalg.norm(bisector, axis=-1, keepdims=True), vertex)
+
+
+def inside_triangle(x, a, b, c) -> np.ndarray:
+    """Return whether ``x`` lies strictly inside triangle ABC, whatever its orientation."""
+    x, a, b, c = _xy(x), _xy(a), _xy(b), _xy(c)
+    sides = np.stack([_cross(b - a, x - a), _cross(c - b, x - b), _cross(a - c, x - c)], axis=-1)
+    return np.all(sides > 0, axis=-1) | np.all(sides < 0, axis=-1)
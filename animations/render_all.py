@@ -0,0 +1,466 @@
+"""Render every scene in this directory, in parallel and incrementally.
+
+Run from the repository root::
+
+    python animations/render_all.py                      # every scene, medium quality
+    python animations/render_all.py -q high -j 4
+    python animations/render_all.py TriangleCircles --force
+    python animations/render_all.py --list
+    python animations/render_all.py --precompile-only
+
+Scenes are found by parsing the modules here: every class deriving, directly
+or through another class of the module, from a manim scene class. Each scene
+is rendered by its own ``manim`` process, ``--jobs`` at a time.
+
+A manifest in the media directory records, per scene and quality, a hash of
+the scene's source (its module and the local modules it imports) and of the
+render settings. Scenes whose hash is unchanged and whose video still exists
+are skipped, so after an edit only the scenes of the edited module are
+rendered again.
+
+Before rendering, the ``MathTex``, ``Tex`` and ``Text`` mobjects the scenes
+create with constant arguments are compiled across a process pool into the
+media directory's TeX and text caches, which every render reads. Renders then
+spend no time in LaTeX, dvisvgm or Pango for them, and parallel renders never
+compile the same formula at once.
+"""
+
+import argparse
+import ast
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+ANIMATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(ANIMATIONS_DIR)
+DEFAULT_MEDIA_DIR = os.path.join(REPO_ROOT, "media")
+MANIFEST_NAME = "render_manifest.json"
+# Record of the TeX and text compiled ahead of rendering
+TEX_MANIFEST_NAME = "tex_manifest.json"
+
+# Preset -> manim quality flag and the directory manim writes its videos to
+QUALITY_PRESETS = {
+    "low": ("l", "480p15"),
+    "medium": ("m", "720p30"),
+    "high": ("h", "1080p60"),
+    "production": ("p", "1440p60"),
+    "4k": ("k", "2160p60"),
+}
+
+# Scene classes of manim that scenes here derive from
+MANIM_SCENE_CLASSES = frozenset({
+    "Scene", "MovingCameraScene", "ThreeDScene", "SpecialThreeDScene",
+    "ZoomedScene", "VectorScene", "LinearTransformationScene",
+})
+
+# Bump to render everything again, e.g. after a change in how scenes are rendered
+RENDER_VERSION = 1
+
+
+@dataclass(frozen=True)
+class SceneInfo:
+    name: str
+    # Path of the module defining the scene
+    path: str
+
+    @property
+    def module(self) -> str:
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+
+def discover_scenes(directory: str = ANIMATIONS_DIR) -> List[SceneInfo]:
+    """Return the scenes defined in the modules of ``directory``, without importing them."""
+    scenes = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if not filename.endswith(".py") or filename.startswith("_") or path == os.path.abspath(__file__):
+            continue
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        scene_classes = set(MANIM_SCENE_CLASSES)
+        # In order of definition, so a subclass of a scene defined earlier is a scene too
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and any(_base_name(base) in scene_classes for base in node.bases):
+                scene_classes.add(node.name)
+                scenes.append(SceneInfo(node.name, path))
+    return scenes
+
+
+def _base_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def local_dependencies(path: str) -> List[str]:
+    """Return ``path`` and the modules of its directory it imports, transitively."""
+    directory = os.path.dirname(path)
+    seen: Set[str] = set()
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        with open(current, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=current)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                candidate = os.path.join(directory, name.split(".")[0] + ".py")
+                if os.path.exists(candidate):
+                    pending.append(candidate)
+    return sorted(seen)
+
+
+def scene_hash(scene: SceneInfo, quality: str, extra_args: Iterable[str] = ()) -> str:
+    """Hash what a render of ``scene`` depends on: its sources and the render settings."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([RENDER_VERSION, scene.name, quality, list(extra_args)]).encode("utf-8"))
+    for dependency in local_dependencies(scene.path):
+        digest.update(os.path.basename(dependency).encode("utf-8") + b"\0")
+        with open(dependency, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def output_path(scene: SceneInfo, quality: str, media_dir: str = DEFAULT_MEDIA_DIR) -> str:
+    """Return the path manim writes the video of ``scene`` to."""
+    return os.path.join(media_dir, "videos", scene.module, QUALITY_PRESETS[quality][1], f"{scene.name}.mp4")
+
+
+def manifest_key(scene: SceneInfo, quality: str) -> str:
+    return f"{scene.module}:{scene.name}:{quality}"
+
+
+def load_manifest(media_dir: str = DEFAULT_MEDIA_DIR) -> Dict[str, dict]:
+    try:
+        with open(os.path.join(media_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest: Dict[str, dict], media_dir: str = DEFAULT_MEDIA_DIR) -> None:
+    path = os.path.join(media_dir, MANIFEST_NAME)
+    os.makedirs(media_dir, exist_ok=True)
+    # Written whole and renamed, so an interrupted run never leaves it truncated
+    fd, temporary = tempfile.mkstemp(dir=media_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def record_render(scene: SceneInfo, quality: str, source_hash: str, seconds: float, media_dir: str = DEFAULT_MEDIA_DIR) -> None:
+    """Add a finished render to the manifest, keeping the entries other renderers wrote meanwhile."""
+    manifest = load_manifest(media_dir)
+    manifest[manifest_key(scene, quality)] = {
+        "hash": source_hash,
+        "output": os.path.relpath(output_path(scene, quality, media_dir), media_dir),
+        "rendered_at": time.time(),
+        "seconds": round(seconds, 2),
+    }
+    save_manifest(manifest, media_dir)
+
+
+def is_up_to_date(scene: SceneInfo, quality: str, manifest: Dict[str, dict], media_dir: str = DEFAULT_MEDIA_DIR, extra_args: Iterable[str] = ()) -> bool:
+    entry = manifest.get(manifest_key(scene, quality))
+    return (
+        entry is not None
+        and entry["hash"] == scene_hash(scene, quality, extra_args)
+        and os.path.exists(output_path(scene, quality, media_dir))
+    )
+
+
+def render_scene(scene: SceneInfo, quality: str, media_dir: str = DEFAULT_MEDIA_DIR, extra_args: Iterable[str] = ()) -> Tuple[bool, str]:
+    """Render ``scene`` in a ``manim`` process; return whether it succeeded and its output."""
+    command = [
+        sys.executable, "-m", "manim", "render",
+        "-q", QUALITY_PRESETS[quality][0],
+        "--media_dir", media_dir,
+        "--progress_bar", "none",
+        *extra_args,
+        scene.path, scene.name,
+    ]
+    result = subprocess.run(command, cwd=REPO_ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return result.returncode == 0, result.stdout
+
+
+# TeX and text pre-compilation
+
+# Mobjects compiled to SVG through LaTeX or Pango when created
+TEX_CLASSES = frozenset({"MathTex", "Tex", "SingleStringMathTex", "Title", "Text", "MarkupText", "Paragraph"})
+# Mobjects made of one MathTex glyph per character
+NUMBER_CLASSES = frozenset({"Integer", "DecimalNumber"})
+
+
+@dataclass(frozen=True)
+class ManimConstant:
+    """A name from ``manim`` (e.g. ``YELLOW``) passed to a TeX or text mobject."""
+
+    name: str
+
+
+@dataclass(frozen=True)
+class TexCall:
+    """A TeX or text mobject created with arguments known before the scene runs."""
+
+    cls: str
+    args: tuple
+    kwargs: Tuple[Tuple[str, object], ...] = ()
+
+    @property
+    def key(self) -> str:
+        return repr((self.cls, self.args, self.kwargs))
+
+
+class _NotStatic(Exception):
+    pass
+
+
+def collect_tex_calls(paths: Iterable[str]) -> List[TexCall]:
+    """
+    Return the TeX and text mobjects the modules at ``paths`` create with
+    constant arguments, e.g. ``MathTex("A", color=RED)``; the others (such
+    as ``Text(f"Distance: {d}")``) are compiled when the scene renders.
+    """
+    calls: Dict[str, TexCall] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call):
+                continue
+            cls = _base_name(node.func)
+            if cls in NUMBER_CLASSES:
+                for digit in "0123456789":
+                    call = TexCall("MathTex", (digit,))
+                    calls[call.key] = call
+            elif cls in TEX_CLASSES and all(keyword.arg is not None for keyword in node.keywords):
+                try:
+                    call = TexCall(
+                        cls,
+                        tuple(_static_value(arg) for arg in node.args),
+                        tuple((keyword.arg, _static_value(keyword.value)) for keyword in node.keywords),
+                    )
+                except _NotStatic:
+                    continue
+                calls[call.key] = call
+    return list(calls.values())
+
+
+def _static_value(node: ast.expr):
+    if isinstance(node, ast.Starred):
+        raise _NotStatic()
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        pass
+    # Upper-case names are manim constants, e.g. colors
+    if isinstance(node, ast.Name) and node.id.isupper():
+        return ManimConstant(node.id)
+    raise _NotStatic()
+
+
+def compile_tex_call(call: TexCall, media_dir: str) -> None:
+    """
+    Create the mobject of ``call``, compiling it into the TeX and text caches
+    of ``media_dir``, where manim finds it when rendering.
+
+    Compiled in a private directory, then moved into the shared caches, so a
+    render or another worker never reads a half-written SVG.
+    """
+    import manim
+
+    def resolve(value):
+        return getattr(manim, value.name) if isinstance(value, ManimConstant) else value
+
+    private = tempfile.mkdtemp(dir=media_dir, prefix=".precompile-")
+    try:
+        with manim.tempconfig({"media_dir": private, "verbosity": "WARNING"}):
+            getattr(manim, call.cls)(*map(resolve, call.args), **{name: resolve(value) for name, value in call.kwargs})
+        for cache in ("Tex", "texts"):
+            source = os.path.join(private, cache)
+            if not os.path.isdir(source):
+                continue
+            target = os.path.join(media_dir, cache)
+            os.makedirs(target, exist_ok=True)
+            for name in os.listdir(source):
+                # Named after a hash of their content, so never stale
+                if name.endswith(".svg") and not os.path.exists(os.path.join(target, name)):
+                    os.replace(os.path.join(source, name), os.path.join(target, name))
+    finally:
+        shutil.rmtree(private, ignore_errors=True)
+
+
+def precompile_tex(
+    paths: Iterable[str],
+    jobs: Optional[int] = None,
+    media_dir: str = DEFAULT_MEDIA_DIR,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Compile the TeX and text of the modules at ``paths`` in parallel, so that
+    their renders do no LaTeX or Pango work. Calls compiled by an earlier run
+    with the same manim version are skipped.
+
+    :return: The number of calls "compiled", "skipped" and "failed"
+    """
+    manifest_path = os.path.join(media_dir, TEX_MANIFEST_NAME)
+    manim_version = importlib.metadata.version("manim")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    done = set(manifest.get("calls", ())) if manifest.get("manim") == manim_version and not force else set()
+
+    calls = collect_tex_calls(paths)
+    pending = [call for call in calls if call.key not in done]
+    counts = {"compiled": 0, "skipped": len(calls) - len(pending), "failed": 0}
+    if not pending:
+        return counts
+    os.makedirs(media_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(pending))) as executor:
+        futures = {executor.submit(compile_tex_call, call, media_dir): call for call in pending}
+        for future, call in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"FAILED to compile {call.cls}{call.args}: {e}", file=sys.stderr, flush=True)
+            else:
+                counts["compiled"] += 1
+                done.add(call.key)
+
+    fd, temporary = tempfile.mkstemp(dir=media_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"manim": manim_version, "calls": sorted(done)}, f, indent=2)
+    os.replace(temporary, manifest_path)
+    return counts
+
+
+def render_scenes(
+    scenes: List[SceneInfo],
+    quality: str = "medium",
+    jobs: Optional[int] = None,
+    media_dir: str = DEFAULT_MEDIA_DIR,
+    force: bool = False,
+    extra_args: Iterable[str] = (),
+    precompile: bool = True,
+) -> Dict[str, List[SceneInfo]]:
+    """
+    Render the out-of-date ``scenes`` in parallel, updating the manifest as
+    each one finishes.
+
+    :param jobs: Scenes rendered at once (default: the CPU count)
+    :param force: Render every scene, even up-to-date ones
+    :param extra_args: Further ``manim render`` arguments, part of the scene hash
+    :param precompile: Compile the scenes' TeX and text first (see ``precompile_tex``)
+    :return: The scenes "rendered", "skipped" and "failed"
+    """
+    extra_args = list(extra_args)
+    manifest = load_manifest(media_dir)
+    results: Dict[str, List[SceneInfo]] = {"rendered": [], "skipped": [], "failed": []}
+    pending = []
+    for scene in scenes:
+        if not force and is_up_to_date(scene, quality, manifest, media_dir, extra_args):
+            results["skipped"].append(scene)
+        else:
+            pending.append(scene)
+
+    if precompile and pending:
+        start = time.perf_counter()
+        counts = precompile_tex(sorted({scene.path for scene in pending}), jobs, media_dir)
+        print(
+            f"compiled {counts['compiled']} TeX and text mobjects ({counts['skipped']} cached, "
+            f"{counts['failed']} failed) in {time.perf_counter() - start:.1f}s", flush=True
+        )
+
+    lock = threading.Lock()
+
+    def render(scene: SceneInfo) -> None:
+        # Hashed before rendering, so an edit made meanwhile is rendered next time
+        source_hash = scene_hash(scene, quality, extra_args)
+        start = time.perf_counter()
+        ok, output = render_scene(scene, quality, media_dir, extra_args)
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                record_render(scene, quality, source_hash, elapsed, media_dir)
+                results["rendered"].append(scene)
+                print(f"rendered {scene.name} in {elapsed:.1f}s", flush=True)
+            else:
+                results["failed"].append(scene)
+                print(f"FAILED {scene.name}:\n{output}", file=sys.stderr, flush=True)
+
+    # Each render is a manim process; the threads only wait on them
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        list(executor.map(render, pending))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names (default: every scene)")
+    parser.add_argument("-q", "--quality", choices=QUALITY_PRESETS, default="medium")
+    parser.add_argument("-j", "--jobs", type=int, help="scenes rendered at once (default: the CPU count)")
+    parser.add_argument("--media-dir", default=DEFAULT_MEDIA_DIR)
+    parser.add_argument("--force", action="store_true", help="render up-to-date scenes too")
+    parser.add_argument("--list", action="store_true", help="list the scenes and whether they are up to date")
+    parser.add_argument("--no-precompile", action="store_true", help="leave TeX and text to be compiled by each render")
+    parser.add_argument("--precompile-only", action="store_true", help="only compile the scenes' TeX and text")
+    args, extra_args = parser.parse_known_args(argv)
+
+    scenes = discover_scenes()
+    if args.scenes:
+        unknown = set(args.scenes) - {scene.name for scene in scenes}
+        if unknown:
+            parser.error(f"unknown scenes: {', '.join(sorted(unknown))}")
+        scenes = [scene for scene in scenes if scene.name in args.scenes]
+
+    if args.list:
+        manifest = load_manifest(args.media_dir)
+        for scene in scenes:
+            state = "up to date" if is_up_to_date(scene, args.quality, manifest, args.media_dir, extra_args) else "out of date"
+            print(f"{scene.name:<28} {os.path.basename(scene.path):<24} {state}")
+        return 0
+
+    start = time.perf_counter()
+    if args.precompile_only:
+        counts = precompile_tex(sorted({scene.path for scene in scenes}), args.jobs, args.media_dir, args.force)
+        print(
+            f"{counts['compiled']} compiled, {counts['skipped']} cached, {counts['failed']} failed "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return 1 if counts["failed"] else 0
+
+    results = render_scenes(
+        scenes, args.quality, args.jobs, args.media_dir, args.force, extra_args, precompile=not args.no_precompile
+    )
+    print(
+        f"{len(results['rendered'])} rendered, {len(results['skipped'])} up to date, "
+        f"{len(results['failed'])} failed in {time.perf_counter() - start:.1f}s"
+    )
+    return 1 if results["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
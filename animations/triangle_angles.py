@@ -1,16 +1,24 @@
 from manim import *
 import numpy as np
+from geometry import angle_between, angle_bisector, angle_of
 
 class TriangleAnglesSum(Scene):
+    # Vertices of the triangle; override in a subclass for a variant
+    vertices = ((-3, -1.5, 0), (3, -1.5, 0), (0, 2, 0))
+    # Distance of the angle labels from their vertex
+    LABEL_DISTANCE = 0.7
+
     def construct(self):
         # Create a triangle
-        triangle = Polygon([-3, -1.5, 0], [3, -1.5, 0], [0, 2, 0], color=WHITE)
+        triangle = Polygon(*self.vertices, color=WHITE)
         
-        # Create labels for the angles
+        # Create labels for the angles, inside each angle on its bisector
+        corners = np.array(self.vertices, dtype=float)
+        label_positions = corners + self.LABEL_DISTANCE * angle_bisector(corners, np.roll(corners, -1, axis=0), np.roll(corners, 1, axis=0))
         labels = VGroup(
-            MathTex(r"\alpha").move_to([-2.5, -1, 0]),
-            MathTex(r"\beta").move_to([2.5, -1, 0]),
-            MathTex(r"\gamma").move_to([0, 1.5, 0])
+            MathTex(r"\alpha").move_to(label_positions[0]),
+            MathTex(r"\beta").move_to(label_positions[1]),
+            MathTex(r"\gamma").move_to(label_positions[2])
         )
         
         # Create the equation
@@ -22,14 +30,14 @@ class TriangleAnglesSum(Scene):
         
         # Calculate angles and create arcs
         vertices = triangle.get_vertices()
-        angles = []
+        # All three angles at once, with the direction of the side each arc starts from
+        sides = np.roll(vertices, -1, axis=0) - vertices
+        angles = angle_between(sides, np.roll(vertices, 1, axis=0) - vertices)
+        rotation_angles = angle_of(sides)
         arcs = []
         colors = [RED, GREEN, BLUE]
         for i in range(3):
-            v1 = vertices[(i+1)%3] - vertices[i]
-            v2 = vertices[(i-1)%3] - vertices[i]
-            angle = self.angle_between_vectors(v1, v2)
-            angles.append(angle)
+            angle = angles[i]
             
             # Create arc
             arc = Arc(radius=0.3, angle=angle, color=colors[i])
@@ -44,8 +52,7 @@ class TriangleAnglesSum(Scene):
             arc.move_arc_center_to(arc_center)
             
             # Rotate arc to align with angle
-            rotation_angle = self.angle_of_vector(v1)
-            arc.rotate(rotation_angle, about_point=arc_center)
+            arc.rotate(rotation_angles[i], about_point=arc_center)
             
             arcs.append(arc)
 
@@ -87,9 +94,3 @@ class TriangleAnglesSum(Scene):
         # Show rotation
         self.play(Rotate(triangle, angle=2*PI, about_point=triangle.get_center()), run_time=4)
         self.wait(1)
-
-    def angle_between_vectors(self, v1, v2):
-        return np.arccos(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))
-
-    def angle_of_vector(self, v):
-        return np.arctan2(v[1], v[0])
@@ -1,12 +1,76 @@
 from manim import *
 import numpy as np
+from geometry import circumcircle, concyclic_residual, inside_triangle, interior_angles, miquel_point, points_on_sides
 
 class TriangleCircles(Scene):
+    """
+    Miquel's theorem on triangle ABC with P on BC, Q on CA and R on AB.
+
+    Variants are subclasses overriding ``vertices`` and ``ratios``; pick them
+    from a batch checked with ``variants``, e.g.::
+
+        class TriangleCirclesSkewed(TriangleCircles):
+            vertices = ((-2.54, -1.73, 0), (2.06, -1.98, 0), (0.94, 2.91, 0))
+            ratios = (0.6, 0.35, 0.73)
+    """
+
+    # Vertices A, B, C
+    vertices = ((-3, -1.5, 0), (3, -1.5, 0), (0, 3, 0))
+    # Where P, Q and R divide BC, CA and AB, from B, C and A respectively
+    ratios = (0.6, 0.35, 0.6)
+
+    # Regions the vertices are drawn from by ``variants``, as (x, y) ranges;
+    # the labels are placed for a triangle standing on AB
+    VERTEX_REGIONS = (((-3.5, -2), (-2, -1)), ((2, 3.5), (-2, -1)), ((-1.5, 1.5), (2, 3)))
+    # Checks a configuration must pass to be shown
+    MIN_ANGLE = 25 * DEGREES
+    MAX_CIRCLE_RADIUS = 3.5
+    TOLERANCE = 1e-9
+
+    @classmethod
+    def configuration(cls, vertices, ratios):
+        """Return the points A, B, C, P, Q, R and X of configurations, as arrays of shape (..., 3)."""
+        A, B, C = (np.asarray(v, dtype=float) for v in np.moveaxis(np.asarray(vertices, dtype=float), -2, 0))
+        P, Q, R = points_on_sides(A, B, C, ratios)
+        return A, B, C, P, Q, R, miquel_point(A, B, C, P, Q, R)
+
+    @classmethod
+    def validate(cls, vertices, ratios):
+        """
+        Return whether each configuration makes a good exercise: X on circle
+        CPQ to within ``TOLERANCE``, X inside the triangle, no sliver angles
+        and circles that fit the frame.
+        """
+        A, B, C, P, Q, R, X = cls.configuration(vertices, ratios)
+        radii = np.stack([circumcircle(A, Q, R)[1], circumcircle(B, R, P)[1], circumcircle(C, P, Q)[1]], axis=-1)
+        with np.errstate(invalid="ignore"):
+            return (
+                (concyclic_residual(X, C, P, Q) < cls.TOLERANCE)
+                & inside_triangle(X, A, B, C)
+                & (interior_angles(A, B, C).min(axis=-1) >= cls.MIN_ANGLE)
+                & (radii.max(axis=-1) <= cls.MAX_CIRCLE_RADIUS)
+            )
+
+    @classmethod
+    def variants(cls, count, seed=0):
+        """
+        Draw ``count`` random configurations at once and return the valid
+        ones as (vertices, ratios) arrays, of shapes (n, 3, 3) and (n, 3).
+        """
+        rng = np.random.default_rng(seed)
+        regions = np.asarray(cls.VERTEX_REGIONS, dtype=float)
+        xy = rng.uniform(regions[..., 0], regions[..., 1], size=(count, 3, 2))
+        vertices = np.concatenate([xy, np.zeros((count, 3, 1))], axis=-1)
+        ratios = rng.uniform(0.25, 0.75, size=(count, 3))
+        valid = cls.validate(vertices, ratios)
+        return vertices[valid], ratios[valid]
+
     def construct(self):
+        if not self.validate(self.vertices, self.ratios):
+            raise ValueError(f"{type(self).__name__}: invalid configuration, see TriangleCircles.validate")
+        A, B, C, P, Q, R, X = self.configuration(self.vertices, self.ratios)
+
         # Create the triangle ABC
-        A = np.array([-3, -1.5, 0])
-        B = np.array([3, -1.5, 0])
-        C = np.array([0, 3, 0])
         triangle = Polygon(A, B, C, color=WHITE)
         
         # Create labels for the vertices
@@ -17,9 +81,6 @@ class TriangleCircles(Scene):
         )
         
         # Create points P, Q, R
-        P = B + (C - B) * 0.6
-        Q = C + (A - C) * 0.35
-        R = A + (B - A) * 0.60
         points = VGroup(
             Dot(P, color=YELLOW),
             Dot(Q, color=PINK),
@@ -36,23 +97,7 @@ class TriangleCircles(Scene):
         circle_BRP = Circle.from_three_points(B, R, P, color=PINK)
         circle_CPQ = DashedVMobject(Circle.from_three_points(C, P, Q, color=ORANGE), num_dashes=50)
         
-        # Find intersection point X
-        def circle_intersection(circle1, circle2):
-            center1, radius1 = circle1.get_center(), circle1.radius
-            center2, radius2 = circle2.get_center(), circle2.radius
-            d = np.linalg.norm(center1 - center2)
-            a = (radius1**2 - radius2**2 + d**2) / (2*d)
-            h = np.sqrt(radius1**2 - a**2)
-            p = center1 + a * (center2 - center1) / d
-            perp = np.array([-center2[1] + center1[1], center2[0] - center1[0], 0])
-            X1 = p + h * perp / np.linalg.norm(perp)
-            X2 = p - h * perp / np.linalg.norm(perp)
-            # Return the point inside the triangle
-            if np.dot(X1 - A, B - A) > 0 and np.dot(X1 - B, C - B) > 0 and np.dot(X1 - C, A - C) > 0:
-                return X1
-            return X2
-
-        X = circle_intersection(circle_AQR, circle_BRP)
+        # X, where the circles meet: the Miquel point
         point_X = Dot(X, color=YELLOW)
         label_X = MathTex("X", color=YELLOW).next_to(X, 2*DOWN+2*LEFT, buff=0.2)
         
@@ -180,16 +225,3 @@ class TriangleCircles(Scene):
             run_time=2
         )
         self.wait(1)
-
-def line_intersection(line1, line2):
-    x1, y1 = line1[0][:2]
-    x2, y2 = line1[1][:2]
-    x3, y3 = line2[0][:2]
-    x4, y4 = line2[1][:2]
-    
-    den = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-    if den == 0:
-        return None  # Lines are parallel
-    
-    t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / den
-    return np.array([x1 + t * (x2 - x1), y1 + t * (y2 - y1), 0])
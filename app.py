@@ -1,51 +1,253 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, render_template, request, jsonify, send_file, Response, stream_with_context, current_app, url_for
 from flask_babel import Babel
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
+import asyncio
 import io
-import PyPDF2
+import json
+import shutil
+import tempfile
+from openai import RateLimitError
+from common.cache import Cache, hash_bytes, hash_stream
+from common.filetypes import describe_supported, detect_file_type, load_file_handler_modules, supported_extensions
+from common.history import ConversationMemory
+from common.ingest import ChunkBuffer, ExtractionPool, text_splitter
+from common.llm import DEFAULT_MODEL, SUMMARY_MODEL, SUMMARY_PROMPT, LLMGateway
+from common.metrics import CONTENT_TYPE_LATEST, metrics
+from common.render_queue import DONE, QUALITY_PRESETS, RenderQueue, RenderQueueFull
+from common.response_cache import ResponseCache, conversation_context
+from common.scheduler import INTERACTIVE, RateLimitScheduler
+from common.sessions import create_session_store, new_session_id
+from common.summarize import map_reduce_summarize
+
+class SpooledRequest(Request):
+    """Request that keeps small uploads in memory and spools larger ones to disk."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= current_app.config['UPLOAD_SPOOL_THRESHOLD']:
+            return io.BytesIO()
+        # A named file, so the extraction workers can open it by path
+        return tempfile.NamedTemporaryFile('wb+', suffix=os.path.splitext(filename or '')[1])
 
 app = Flask(__name__)
+app.request_class = SpooledRequest
 app.config.from_object('config')
 babel = Babel(app)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Per-stage latency and token metrics, served at /metrics
+if app.config['METRICS_ENABLED']:
+    metrics.enable()
+
+# Persistent cache for document summaries, shared with the Chainlit app
+summary_cache = Cache(os.path.join(app.config['CACHE_DIR'], 'summaries.sqlite3'), app.config['CACHE_MAX_BYTES'])
+
+# Initialize the LLM gateway shared with the Chainlit app; its scheduler keeps
+# requests within the provider's rate limits, chat ahead of summarization
+gateway = LLMGateway(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    timeout=app.config['LLM_TIMEOUT'],
+    connect_timeout=app.config['LLM_CONNECT_TIMEOUT'],
+    max_connections=app.config['LLM_MAX_CONNECTIONS'],
+    cache=summary_cache,
+    scheduler=RateLimitScheduler(
+        app.config['LLM_REQUESTS_PER_MINUTE'] / app.config['LLM_PROCESSES'],
+        app.config['LLM_TOKENS_PER_MINUTE'] / app.config['LLM_PROCESSES'],
+        max_retries=app.config['LLM_MAX_RETRIES'],
+        background_reserve=app.config['LLM_BACKGROUND_RESERVE']
+    )
+)
+
+# Large documents are summarized chunk by chunk
+SUMMARY_CHUNK_SIZE = 4000
+
+# Additional document formats, see common/filetypes.py
+load_file_handler_modules(app.config['FILE_HANDLER_MODULES'])
+
+# Worker processes extracting the pages of uploaded PDFs in parallel
+extraction_pool = ExtractionPool(
+    max_workers=app.config['EXTRACT_WORKERS'],
+    timeout=app.config['EXTRACT_TIMEOUT'],
+    ocr_dpi=app.config['OCR_DPI'],
+    ocr_min_chars=app.config['OCR_MIN_CHARS'],
+    ocr_cache=Cache(os.path.join(app.config['CACHE_DIR'], 'ocr.sqlite3'), app.config['CACHE_MAX_BYTES'])
+)
+
+# Conversations are kept server side; clients only send a session id
+session_store = create_session_store(
+    app.config['SESSION_BACKEND'],
+    app.config['CACHE_DIR'],
+    app.config['SESSION_MAX_BYTES'],
+    app.config['SESSION_MAX_COUNT']
+)
+
+# Replies to repeated questions, answered without an LLM call
+response_cache = ResponseCache(
+    max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+    ttl=app.config['RESPONSE_CACHE_TTL'],
+    threshold=app.config['RESPONSE_CACHE_THRESHOLD']
+) if app.config['RESPONSE_CACHE_MAX_ENTRIES'] > 0 else None
+
+# Background renders of the animation scenes whose video is missing or out
+# of date; see animations/render_all.py for rendering them ahead of time
+render_queue = RenderQueue(
+    app.config['ANIMATIONS_MEDIA_DIR'],
+    app.config['ANIMATION_QUALITY'],
+    max_workers=app.config['ANIMATION_RENDER_WORKERS'],
+    max_queued=app.config['ANIMATION_MAX_QUEUED']
+)
 
 @app.route('/')
 def home():
-    return render_template('home.html')
+    return render_template('home.html', accept=','.join(supported_extensions()))
 
 @app.route('/chat', methods=['POST'])
 def chat():
     message = request.json['message']
-    conversation_history = request.json.get('conversation_history', [])
+    session_id = request.json.get('session_id') or new_session_id()
+    memory = load_memory(session_id)
 
-    # Add user message to history
-    conversation_history.append({"role": "user", "content": message})
+    # Fold the oldest turns into the running summary once the history is over
+    # its token budget, before the prompt is built so that it stays within it
+    memory.fold(summarize_history)
+    context = chat_context(memory)
 
-    # Generate response using OpenAI
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=conversation_history,
-        max_tokens=150
-    )
+    # Add user message to history
+    memory.append("user", message)
 
-    # Extract assistant's reply
-    reply = response.choices[0].message.content
+    # Answer repeated questions from the cache, otherwise generate the
+    # response using OpenAI
+    reply = response_cache.get(message, context) if response_cache else None
+    cached = reply is not None
+    if not cached:
+        reply = gateway.complete(memory.to_messages(), max_tokens=150)
+        if response_cache:
+            response_cache.set(message, context, reply)
 
     # Add assistant's reply to history
-    conversation_history.append({"role": "assistant", "content": reply})
+    memory.append("assistant", reply)
+    session_store.set(session_id, memory.to_dict())
 
     return jsonify({
         'reply': reply,
-        'conversation_history': conversation_history
+        'session_id': session_id,
+        'cached': cached
     })
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same as /chat, but the reply is streamed token by token as Server-Sent Events."""
+    message = request.json['message']
+    session_id = request.json.get('session_id') or new_session_id()
+    memory = load_memory(session_id)
+
+    # Fold old turns before the prompt is built, as /chat does, so that it
+    # stays within the history budget
+    memory.fold(summarize_history)
+    context = chat_context(memory)
+    memory.append("user", message)
+
+    # A cached reply is sent as a single token
+    cached = response_cache.get(message, context) if response_cache else None
+    stream = iter([cached]) if cached is not None else gateway.stream(memory.to_messages(), max_tokens=150)
+
+    def generate():
+        tokens = []
+        try:
+            yield sse_event('session', {'session_id': session_id})
+            for token in stream:
+                tokens.append(token)
+                yield sse_event('token', {'token': token})
+            reply = "".join(tokens)
+            memory.append("assistant", reply)
+            session_store.set(session_id, memory.to_dict())
+            if response_cache and cached is None:
+                response_cache.set(message, context, reply)
+            yield sse_event('done', {'cached': cached is not None})
+        except RateLimitError:
+            yield sse_event('error', {'error': RATE_LIMITED_MESSAGE})
+        finally:
+            # Also runs when the client disconnects: stop reading upstream
+            if cached is None:
+                stream.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def load_memory(session_id):
+    return ConversationMemory.from_dict(
+        session_store.get(session_id),
+        max_tokens=app.config['HISTORY_MAX_TOKENS'],
+        min_recent_turns=app.config['HISTORY_MIN_TURNS']
+    )
+
+def chat_context(memory):
+    # What a reply depends on besides the question; see conversation_context
+    return f"{DEFAULT_MODEL}\n{conversation_context(memory.to_messages())}"
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/animations')
+def list_animations():
+    quality = request.args.get('quality', render_queue.default_quality)
+    return jsonify({'animations': [
+        animation_status_dict(scene, quality) for scene in render_queue.scenes.values()
+    ]})
+
+@app.route('/animations/<scene>')
+def animation(scene):
+    """Serve a scene's video, or queue its render and answer 202 with the job status."""
+    scene, quality, error = find_animation(scene)
+    if error:
+        return error
+    path = render_queue.video_path(scene, quality)
+    if path is not None:
+        # Conditional: answers Range requests (seeking) and revalidation
+        return send_file(path, mimetype='video/mp4', conditional=True, max_age=app.config['ANIMATION_CACHE_MAX_AGE'])
+    try:
+        job = render_queue.submit(scene, quality)
+    except RenderQueueFull:
+        return jsonify({'error': 'Too many animations are being rendered, please try again later.'}), 503, {'Retry-After': '60'}
+    location = url_for('animation_status', scene=scene.name, quality=quality)
+    return jsonify(job.to_dict()), 202, {'Location': location, 'Retry-After': '5'}
+
+@app.route('/animations/<scene>/status')
+def animation_status(scene):
+    scene, quality, error = find_animation(scene)
+    if error:
+        return error
+    return jsonify(animation_status_dict(scene, quality))
+
+def find_animation(name):
+    scene = render_queue.scenes.get(name)
+    if scene is None:
+        return None, None, (jsonify({'error': 'Unknown animation'}), 404)
+    quality = request.args.get('quality', render_queue.default_quality)
+    if quality not in QUALITY_PRESETS:
+        return None, None, (jsonify({'error': f"Unknown quality, expected one of {', '.join(QUALITY_PRESETS)}"}), 400)
+    return scene, quality, None
+
+def animation_status_dict(scene, quality):
+    # The job's status, or whether a video rendered ahead of time is there
+    job = render_queue.job(scene, quality)
+    if job is not None and job.status != DONE:
+        return job.to_dict()
+    ready = render_queue.video_path(scene, quality) is not None
+    return {'scene': scene.name, 'quality': quality, 'status': DONE if ready else 'missing', 'progress': 1.0 if ready else None}
+
 @app.route('/summarize', methods=['POST'])
 def summarize_file():
     if 'file' not in request.files:
@@ -53,35 +255,97 @@ def summarize_file():
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-    if file and allowed_file(file.filename):
-        file_content = extract_text_from_file(file)
-        summary = generate_summary(file_content)
+    # The format is recognized from the content first, then the name
+    handler = detect_file_type(file.filename, file.mimetype, file.stream)
+    if handler is not None:
+        # Identical uploads are answered from the cache without any LLM call
+        document_key = document_summary_key(file.stream)
+        summary = summary_cache.get(document_key)
+        if summary is None:
+            file.stream.seek(0)
+            summary = asyncio.run(summarize_document(file, handler))
+            if not summary:
+                return jsonify({'error': 'No content could be extracted from the file'}), 400
+            summary_cache.set(document_key, summary)
         return jsonify({'summary': summary})
-    return jsonify({'error': 'File type not supported'}), 400
+    return jsonify({'error': f'File type not supported. Please upload a {describe_supported()} file.'}), 400
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'txt', 'pdf'}
+def document_summary_key(stream):
+    return hash_bytes('document-summary', SUMMARY_MODEL, SUMMARY_PROMPT, hash_stream(stream))
 
-def extract_text_from_file(file):
-    if file.filename.endswith('.txt'):
-        return file.read().decode('utf-8')
-    elif file.filename.endswith('.pdf'):
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
+@app.errorhandler(413)
+def file_too_large(error):
+    return jsonify({'error': 'File too large'}), 413
 
-def generate_summary(text):
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that summarizes documents."},
-            {"role": "user", "content": f"Please summarize the following text:\n\n{text}"}
-        ],
-        max_tokens=150
+RATE_LIMITED_MESSAGE = 'The assistant is busy right now, please try again in a moment.'
+
+@app.errorhandler(RateLimitError)
+def rate_limited(error):
+    # Only reached once the scheduler has run out of retries
+    return jsonify({'error': RATE_LIMITED_MESSAGE}), 503
+
+async def summarize_document(file, handler):
+    """Summarize an upload chunk by chunk, with a tree reduce over the chunk summaries."""
+    return await summarize_texts(
+        iter_text_from_file(file, handler),
+        lambda text: asyncio.to_thread(generate_summary, text)
     )
-    return response.choices[0].message.content
+
+async def summarize_texts(texts, summarize):
+    """
+    Summarize the pieces of text of a document with ``summarize``, an async
+    function; shared with the async server (asgi.py).
+    """
+    async def chunks():
+        buffer = ChunkBuffer(text_splitter(SUMMARY_CHUNK_SIZE, 200).split_text, SUMMARY_CHUNK_SIZE)
+        async for text in texts:
+            for chunk in buffer.feed(text):
+                yield chunk
+        for chunk in buffer.flush():
+            yield chunk
+
+    return await map_reduce_summarize(
+        chunks(),
+        summarize,
+        concurrency=app.config['SUMMARY_CONCURRENCY'],
+        fan_in=app.config['SUMMARY_FAN_IN']
+    )
+
+async def iter_text_from_file(file, handler):
+    """Yield the text of an upload piece by piece, without reading it whole."""
+    path = getattr(file.stream, 'name', None)
+    if isinstance(path, str):
+        # Spooled to disk: read it through the extraction pool (e.g. PDF
+        # pages in parallel)
+        async for text in handler.iter_texts(path, extraction_pool):
+            yield text
+        return
+
+    texts = handler.iter_stream_texts(file.stream)
+    if texts is None:
+        # Small in-memory upload of a format only read from a path
+        with tempfile.NamedTemporaryFile('wb+', suffix=os.path.splitext(file.filename)[1]) as f:
+            shutil.copyfileobj(file.stream, f)
+            f.flush()
+            async for text in handler.iter_texts(f.name, extraction_pool):
+                yield text
+        return
+
+    # Small in-memory upload: read it piece by piece in place
+    while True:
+        with metrics.span('extract'):
+            text = next(texts, None)
+        if text is None:
+            break
+        yield text
+
+def generate_summary(text):
+    return gateway.summarize(text)
+
+def summarize_history(text):
+    # The user is waiting on this one, so it is not queued behind documents
+    return gateway.summarize(text, priority=INTERACTIVE)
 
 if __name__ == '__main__':
+    # Development server; in production, serve asgi.py
     app.run(debug=True)
@@ -0,0 +1,270 @@
+"""Production server: the routes of app.py, served asynchronously.
+
+Each chat awaits the LLM on the gateway's pooled async client instead of
+holding a worker thread, so one process serves hundreds of chats at once.
+Run it with::
+
+    python asgi.py
+
+or with uvicorn directly, e.g. ``uvicorn asgi:app --workers 4`` (then set
+``LLM_PROCESSES=4``, so the workers share the LLM rate limits). On SIGTERM
+the server stops accepting connections, lets in-flight requests finish for
+up to SERVER_GRACEFUL_TIMEOUT seconds, then closes the LLM clients, the
+extraction workers and the animation render queue.
+"""
+import asyncio
+import contextlib
+import os
+import shutil
+import tempfile
+
+from openai import RateLimitError
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import app as flask_app
+from app import (
+    RATE_LIMITED_MESSAGE, animation_status_dict, chat_context, document_summary_key, extraction_pool, gateway,
+    load_memory, render_queue, response_cache, session_store, sse_event, summarize_texts, summary_cache
+)
+from common.filetypes import describe_supported, detect_file_type, supported_extensions
+from common.metrics import CONTENT_TYPE_LATEST, metrics
+from common.render_queue import QUALITY_PRESETS, RenderQueueFull
+from common.scheduler import INTERACTIVE
+from common.sessions import new_session_id
+
+config = flask_app.app.config
+
+async def home(request):
+    template = flask_app.app.jinja_env.get_template('home.html')
+    return HTMLResponse(template.render(accept=','.join(supported_extensions())))
+
+async def chat(request):
+    body = await request.json()
+    message = body['message']
+    session_id = body.get('session_id') or new_session_id()
+    memory = await load_memory_async(session_id)
+
+    await memory.afold(summarize_history)
+    context = chat_context(memory)
+    memory.append("user", message)
+
+    reply = response_cache.get(message, context) if response_cache else None
+    cached = reply is not None
+    if not cached:
+        reply = await gateway.acomplete(memory.to_messages(), max_tokens=150)
+        if response_cache:
+            response_cache.set(message, context, reply)
+
+    memory.append("assistant", reply)
+    await asyncio.to_thread(session_store.set, session_id, memory.to_dict())
+
+    return JSONResponse({
+        'reply': reply,
+        'session_id': session_id,
+        'cached': cached
+    })
+
+async def chat_stream(request):
+    """Same as /chat, but the reply is streamed token by token as Server-Sent Events."""
+    body = await request.json()
+    message = body['message']
+    session_id = body.get('session_id') or new_session_id()
+    memory = await load_memory_async(session_id)
+
+    await memory.afold(summarize_history)
+    context = chat_context(memory)
+    memory.append("user", message)
+
+    cached = response_cache.get(message, context) if response_cache else None
+
+    async def generate():
+        stream = gateway.astream(memory.to_messages(), max_tokens=150) if cached is None else None
+        tokens = []
+        try:
+            yield sse_event('session', {'session_id': session_id})
+            if stream is None:
+                tokens.append(cached)
+                yield sse_event('token', {'token': cached})
+            else:
+                async for token in stream:
+                    tokens.append(token)
+                    yield sse_event('token', {'token': token})
+            reply = "".join(tokens)
+            memory.append("assistant", reply)
+            await asyncio.to_thread(session_store.set, session_id, memory.to_dict())
+            if response_cache and cached is None:
+                response_cache.set(message, context, reply)
+            yield sse_event('done', {'cached': cached is not None})
+        except RateLimitError:
+            yield sse_event('error', {'error': RATE_LIMITED_MESSAGE})
+        finally:
+            # Also runs when the client disconnects: stop reading upstream
+            if stream is not None:
+                await stream.aclose()
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def metrics_endpoint(request):
+    if not metrics.enabled:
+        return JSONResponse({'error': 'Metrics are disabled'}, status_code=404)
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+async def list_animations(request):
+    quality = request.query_params.get('quality', render_queue.default_quality)
+    animations = await asyncio.to_thread(
+        lambda: [animation_status_dict(scene, quality) for scene in render_queue.scenes.values()]
+    )
+    return JSONResponse({'animations': animations})
+
+async def animation(request):
+    """Serve a scene's video, or queue its render and answer 202 with the job status."""
+    scene, quality, error = find_animation(request)
+    if error:
+        return error
+    path = await asyncio.to_thread(render_queue.video_path, scene, quality)
+    if path is not None:
+        return FileResponse(path, media_type='video/mp4', headers={'Cache-Control': f"public, max-age={config['ANIMATION_CACHE_MAX_AGE']}"})
+    try:
+        job = await asyncio.to_thread(render_queue.submit, scene, quality)
+    except RenderQueueFull:
+        return JSONResponse({'error': 'Too many animations are being rendered, please try again later.'}, status_code=503, headers={'Retry-After': '60'})
+    location = f"{request.url_for('animation_status', scene=scene.name)}?quality={quality}"
+    return JSONResponse(job.to_dict(), status_code=202, headers={'Location': location, 'Retry-After': '5'})
+
+async def animation_status(request):
+    scene, quality, error = find_animation(request)
+    if error:
+        return error
+    return JSONResponse(await asyncio.to_thread(animation_status_dict, scene, quality))
+
+def find_animation(request):
+    scene = render_queue.scenes.get(request.path_params['scene'])
+    if scene is None:
+        return None, None, JSONResponse({'error': 'Unknown animation'}, status_code=404)
+    quality = request.query_params.get('quality', render_queue.default_quality)
+    if quality not in QUALITY_PRESETS:
+        return None, None, JSONResponse({'error': f"Unknown quality, expected one of {', '.join(QUALITY_PRESETS)}"}, status_code=400)
+    return scene, quality, None
+
+class RequestTooLarge(Exception):
+    pass
+
+def limit_body(request, max_length):
+    """
+    Return ``request`` with a body that raises ``RequestTooLarge`` once more
+    than ``max_length`` bytes are received, whatever its Content-Length says.
+    """
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > max_length:
+                raise RequestTooLarge()
+        return message
+
+    return Request(request.scope, receive)
+
+async def summarize_file(request):
+    # A declared length is checked before the body is read; a chunked body
+    # is counted while it streams in
+    content_length = request.headers.get('content-length')
+    if content_length is not None:
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            return JSONResponse({'error': 'Invalid Content-Length'}, status_code=400)
+        if content_length > config['MAX_CONTENT_LENGTH']:
+            return JSONResponse({'error': 'File too large'}, status_code=413)
+
+    try:
+        return await summarize_form(limit_body(request, config['MAX_CONTENT_LENGTH']))
+    except RequestTooLarge:
+        return JSONResponse({'error': 'File too large'}, status_code=413)
+
+async def summarize_form(request):
+    async with request.form(max_files=1) as form:
+        file = form.get('file')
+        if file is None or isinstance(file, str):
+            return JSONResponse({'error': 'No file part'}, status_code=400)
+        if not file.filename:
+            return JSONResponse({'error': 'No selected file'}, status_code=400)
+        handler = await asyncio.to_thread(detect_file_type, file.filename, file.content_type, file.file)
+        if handler is None:
+            return JSONResponse({'error': f'File type not supported. Please upload a {describe_supported()} file.'}, status_code=400)
+
+        document_key = await asyncio.to_thread(document_summary_key, file.file)
+        summary = await asyncio.to_thread(summary_cache.get, document_key)
+        if summary is None:
+            summary = await summarize_upload(file, handler)
+            if not summary:
+                return JSONResponse({'error': 'No content could be extracted from the file'}, status_code=400)
+            await asyncio.to_thread(summary_cache.set, document_key, summary)
+        return JSONResponse({'summary': summary})
+
+async def summarize_upload(file, handler):
+    # Every format is read from a path through the extraction pool, so that
+    # no parsing runs on the event loop
+    with tempfile.NamedTemporaryFile('wb+', suffix=os.path.splitext(file.filename)[1]) as f:
+        await asyncio.to_thread(copy_upload, file.file, f)
+        return await summarize_texts(handler.iter_texts(f.name, extraction_pool), gateway.asummarize)
+
+def copy_upload(source, target):
+    source.seek(0)
+    shutil.copyfileobj(source, target)
+    target.flush()
+
+async def load_memory_async(session_id):
+    return await asyncio.to_thread(load_memory, session_id)
+
+async def summarize_history(text):
+    return await gateway.asummarize(text, priority=INTERACTIVE)
+
+async def rate_limited(request, error):
+    # Only reached once the scheduler has run out of retries
+    return JSONResponse({'error': RATE_LIMITED_MESSAGE}, status_code=503)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    # In-flight requests are done: release the pooled connections and the
+    # extraction workers
+    await gateway.aclose()
+    gateway.close()
+    extraction_pool.shutdown()
+    render_queue.shutdown()
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/chat', chat, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/metrics', metrics_endpoint),
+        Route('/summarize', summarize_file, methods=['POST']),
+        Route('/animations', list_animations),
+        Route('/animations/{scene}', animation),
+        Route('/animations/{scene}/status', animation_status, name='animation_status'),
+    ],
+    exception_handlers={RateLimitError: rate_limited},
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(
+        'asgi:app',
+        host=config['SERVER_HOST'],
+        port=config['SERVER_PORT'],
+        workers=config['SERVER_WORKERS'],
+        timeout_graceful_shutdown=config['SERVER_GRACEFUL_TIMEOUT']
+    )
@@ -0,0 +1,5 @@
+"""Performance benchmarks for the Flask and Chainlit front ends.
+
+Everything runs against a local OpenAI-compatible stub (``stub_server``), so
+results are reproducible and cost nothing. See ``run`` for usage.
+"""
@@ -0,0 +1,122 @@
+"""Deterministic fixture documents of any size for the benchmarks.
+
+The same ``pages`` and ``seed`` always give the same file, so results can be
+compared across runs. Files are generated once into a directory and reused.
+"""
+
+import csv
+import os
+import random
+from typing import Iterator, List
+
+FORMATS = ("pdf", "pptx", "csv", "txt")
+
+# Lines of text per PDF/TXT page and per slide, and CSV rows per "page"
+LINES_PER_PAGE = 40
+LINES_PER_SLIDE = 8
+ROWS_PER_PAGE = 50
+
+_VOCABULARY = (
+    "revenue growth quarter customer product market forecast margin strategy "
+    "analysis report regional sales team pricing contract supplier inventory "
+    "budget risk compliance launch review target performance operations cost "
+    "data model service platform partner investment region annual summary"
+).split()
+_CITIES = ["Paris", "Lyon", "Berlin", "Madrid", "Rome", "London", "Lisbon", "Vienna", "Oslo", "Prague"]
+
+
+def fixture_path(directory: str, fmt: str, pages: int, seed: int = 0) -> str:
+    """Return the path of a ``pages``-page fixture of format ``fmt``, generating it if needed."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown fixture format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    path = os.path.join(directory, f"fixture-{pages}p-{seed}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        globals()[f"write_{fmt}"](tmp_path, pages, seed)
+        os.replace(tmp_path, path)
+    return path
+
+
+def _lines(rng: random.Random, count: int) -> Iterator[str]:
+    for _ in range(count):
+        words = rng.choices(_VOCABULARY, k=rng.randint(8, 14))
+        yield " ".join(words).capitalize() + "."
+
+
+def _page_lines(pages: int, seed: int, per_page: int) -> Iterator[List[str]]:
+    rng = random.Random(seed)
+    for page in range(pages):
+        yield [f"Section {page + 1}"] + list(_lines(rng, per_page - 1))
+
+
+def write_txt(path: str, pages: int, seed: int = 0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for lines in _page_lines(pages, seed, LINES_PER_PAGE):
+            f.write("\n".join(lines) + "\n\n")
+
+
+def write_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """Write a text-only PDF, built by hand so no PDF library is needed."""
+    # Objects 1-3 are the catalog, the page tree and the font; then every
+    # page has a page object followed by its content stream
+    page_ids = [4 + 2 * i for i in range(pages)]
+    offsets = []
+    with open(path, "wb") as f:
+        def write_object(body: bytes) -> None:
+            offsets.append(f.tell())
+            f.write(f"{len(offsets)} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        write_object(b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{i} 0 R" for i in page_ids)
+        write_object(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("ascii"))
+        write_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for page_id, lines in zip(page_ids, _page_lines(pages, seed, LINES_PER_PAGE)):
+            write_object(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode("ascii")
+            )
+            text = " T*\n".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+            stream = f"BT\n/F1 10 Tf\n12 TL\n50 760 Td\n{text}\nET".encode("latin-1")
+            write_object(f"<< /Length {len(stream)} >>\nstream\n".encode("ascii") + stream + b"\nendstream")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode("ascii"))
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode("ascii"))
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pptx(path: str, pages: int, seed: int = 0) -> None:
+    """Write a deck of ``pages`` title-and-content slides."""
+    from pptx import Presentation
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for lines in _page_lines(pages, seed, LINES_PER_SLIDE):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = lines[0]
+        slide.placeholders[1].text = "\n".join(lines[1:])
+    prs.save(path)
+
+
+def write_csv(path: str, pages: int, seed: int = 0) -> None:
+    """Write ``pages * ROWS_PER_PAGE`` rows of mixed numeric, categorical and text columns."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "date", "city", "product", "quantity", "amount", "note"])
+        for i in range(pages * ROWS_PER_PAGE):
+            writer.writerow([
+                i + 1,
+                f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                rng.choice(_CITIES),
+                rng.choice(_VOCABULARY),
+                rng.randint(1, 500),
+                f"{rng.uniform(1, 10000):.2f}",
+                next(_lines(rng, 1)) if rng.random() < 0.7 else "",
+            ])
@@ -0,0 +1,413 @@
+"""Load-test the front ends against the local OpenAI stub.
+
+Run from the repository root::
+
+    python -m benchmarks.run flask-chat --concurrency 8 --requests 200
+    python -m benchmarks.run flask-summarize --format pdf --pages 1 10 100 1000
+    python -m benchmarks.run chainlit-chat --concurrency 32 --latency 0.5
+    python -m benchmarks.run chainlit-upload --format pptx --pages 1 100 --requests 4
+
+Every target and document size runs in a fresh process with an empty cache
+directory, so the peak RSS is that of the run alone; the largest child
+process (e.g. an extraction worker) is reported separately. The summary, OCR
+and chat response caches are disabled unless ``--cache`` is given, so repeated
+requests measure ingestion and the LLM rather than cache hits (reported in the
+``cached`` column), and the LLM rate limits are lifted unless
+``LLM_REQUESTS_PER_MINUTE`` and ``LLM_TOKENS_PER_MINUTE`` are set.
+
+``--json`` saves the results; ``--baseline`` compares against saved results
+and exits with status 1 when p95 latency, throughput or peak RSS regressed
+by more than ``--tolerance``.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.fixtures import fixture_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Target name -> document formats it accepts (empty for chat targets)
+TARGETS = {
+    "flask-chat": (),
+    "flask-chat-stream": (),
+    "flask-summarize": ("pdf", "txt", "pptx", "csv"),
+    "chainlit-chat": (),
+    "chainlit-upload": ("pdf", "pptx", "csv", "txt"),
+}
+
+MIME_TYPES = {
+    "pdf": "application/pdf",
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "csv": "text/csv",
+    "txt": "text/plain",
+}
+
+QUESTIONS = [
+    "What were the main revenue drivers this quarter?",
+    "Summarize the risks mentioned so far.",
+    "Which region had the best sales performance?",
+    "How does the pricing strategy compare with last year?",
+    "List the open compliance items.",
+]
+
+# Result fields checked against a baseline, and whether higher is better
+REGRESSION_METRICS = {"p95_ms": False, "throughput": True, "peak_rss_mb": False}
+
+
+# Load generation
+
+def run_threads(op: Callable[[int, dict], None], requests: int, concurrency: int) -> Tuple[List[float], List[str], float]:
+    """Call ``op(i, state)`` ``requests`` times from ``concurrency`` threads, each with its own ``state``."""
+    counter = itertools.count()
+    latencies, errors = [], []
+
+    def worker():
+        state = {}
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                op(i, state)
+            except Exception as e:
+                errors.append(repr(e))
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_tasks(op: Callable[[int, dict], Any], requests: int, concurrency: int) -> Tuple[List[float], List[str], float]:
+    """Async variant of ``run_threads``, with ``concurrency`` tasks on one event loop."""
+    counter = itertools.count()
+    latencies, errors = [], []
+
+    async def worker():
+        state = {}
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                await op(i, state)
+            except Exception as e:
+                errors.append(repr(e))
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+# Targets
+
+class DocumentCacheHits:
+    """
+    Counts the requests answered from an app's document-level summary cache.
+
+    The per-chunk summaries are cached in the same ``Cache``, so its ``hits``
+    count every chunk and reduce step of an upload. Only lookups of the keys
+    made by ``track``'ed functions are counted here, one per upload.
+    """
+
+    def __init__(self, cache):
+        self.count = 0
+        self._keys = set()
+        self._lock = threading.Lock()
+        get = cache.get
+
+        def counting_get(key):
+            value = get(key)
+            if value is not None and key in self._keys:
+                with self._lock:
+                    self.count += 1
+            return value
+
+        cache.get = counting_get
+
+    def track(self, make_key: Callable[..., str], first_arg: Optional[str] = None) -> Callable[..., str]:
+        """Wrap the app's function making document keys (when called with ``first_arg``, if given)."""
+        def tracked(*args):
+            key = make_key(*args)
+            if first_arg is None or args[0] == first_arg:
+                with self._lock:
+                    self._keys.add(key)
+            return key
+        return tracked
+
+
+def bench_flask(target: str, fixture: Optional[str], requests: int, concurrency: int) -> Tuple[List[float], List[str], float, int]:
+    import app as flask_app
+
+    def chat(i: int, state: dict) -> None:
+        client = state.setdefault("client", flask_app.app.test_client())
+        path = "/chat/stream" if target == "flask-chat-stream" else "/chat"
+        response = client.post(path, json={"message": QUESTIONS[i % len(QUESTIONS)], "session_id": state.get("session_id")})
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        if target == "flask-chat-stream":
+            body = response.get_data(as_text=True)
+            if "event: done" not in body:
+                raise RuntimeError(f"{path} stream did not complete: {body[-200:]}")
+            state["session_id"] = json.loads(body.split("data: ", 1)[1].split("\n", 1)[0])["session_id"]
+        else:
+            state["session_id"] = response.json["session_id"]
+
+    def summarize(i: int, state: dict) -> None:
+        client = state.setdefault("client", flask_app.app.test_client())
+        with open(fixture, "rb") as f:
+            response = client.post("/summarize", data={"file": (f, os.path.basename(fixture))}, content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"/summarize returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    document_hits = DocumentCacheHits(flask_app.summary_cache)
+    flask_app.document_summary_key = document_hits.track(flask_app.document_summary_key)
+    try:
+        latencies, errors, wall = run_threads(summarize if target == "flask-summarize" else chat, requests, concurrency)
+        # One response cache lookup per chat request
+        response_hits = sum(flask_app.response_cache.hits.values()) if flask_app.response_cache else 0
+        return latencies, errors, wall, response_hits + document_hits.count
+    finally:
+        flask_app.extraction_pool.shutdown(wait=True)
+        flask_app.gateway.close()
+
+
+def bench_chainlit(target: str, fixture: Optional[str], requests: int, concurrency: int) -> Tuple[List[float], List[str], float, int]:
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    # Loaded from its path, the way `chainlit run` does
+    spec = importlib.util.spec_from_file_location("chainlit_app", os.path.join(REPO_ROOT, "chainlit_chatbot", "app.py"))
+    chainlit_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(chainlit_app)
+    logging.getLogger().setLevel(logging.WARNING)
+    document_hits = DocumentCacheHits(chainlit_app.summary_cache)
+    chainlit_app.hash_bytes = document_hits.track(chainlit_app.hash_bytes, "document-chunks")
+
+    async def start_session() -> None:
+        # Each virtual user gets its own Chainlit session in this task's context
+        init_http_context()
+        await chainlit_app.start()
+
+    async def chat(i: int, state: dict) -> None:
+        if not state:
+            await start_session()
+            state["started"] = True
+        await chainlit_app.main(cl.Message(content=QUESTIONS[i % len(QUESTIONS)]))
+        messages = cl.user_session.get("conversation_memory").messages
+        if not messages or messages[-1]["role"] != "assistant":
+            raise RuntimeError("No reply was added to the conversation")
+
+    async def upload(i: int, state: dict) -> None:
+        await start_session()
+        fmt = os.path.splitext(fixture)[1][1:]
+        element = cl.File(name=os.path.basename(fixture), path=fixture, mime=MIME_TYPES[fmt])
+        await chainlit_app.main(cl.Message(content="", elements=[element]))
+        if not len(cl.user_session.get("document_index")):
+            raise RuntimeError(f"Nothing was indexed from {element.name}")
+
+    async def run():
+        try:
+            return await run_tasks(upload if target == "chainlit-upload" else chat, requests, concurrency)
+        finally:
+            await chainlit_app.gateway.aclose()
+
+    try:
+        latencies, errors, wall = asyncio.run(run())
+        return latencies, errors, wall, document_hits.count
+    finally:
+        chainlit_app.extraction_pool.shutdown(wait=True)
+
+
+# Reporting
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return resource.getrusage(who).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def upstream_requests(base_url: str) -> int:
+    with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0]) as response:
+        return json.load(response)["requests"]
+
+
+def summarize_run(latencies: List[float], errors: List[str], wall: float) -> Dict[str, Any]:
+    result = {"ok": len(latencies), "errors": len(errors), "wall_s": round(wall, 3)}
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        result.update(p50_ms=round(p50, 1), p95_ms=round(p95, 1), p99_ms=round(p99, 1), throughput=round(len(latencies) / wall, 2))
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    columns = [
+        ("target", "target", 18), ("format", "fmt", 4), ("pages", "pages", 5), ("concurrency", "conc", 4),
+        ("ok", "ok", 5), ("errors", "err", 4), ("p50_ms", "p50 ms", 9), ("p95_ms", "p95 ms", 9), ("p99_ms", "p99 ms", 9),
+        ("throughput", "req/s", 8), ("peak_rss_mb", "RSS MB", 7), ("children_rss_mb", "chld MB", 7), ("llm_requests", "LLM", 6),
+        ("cache_hits", "cached", 6),
+    ]
+    print("  ".join(f"{title:>{width}}" for _, title, width in columns))
+    for result in results:
+        print("  ".join(f"{'-' if result.get(key) is None else result[key]!s:>{width}}" for key, _, width in columns))
+    for result in results:
+        if result.get("first_error"):
+            print(f"{result['target']} {result.get('pages') or ''}: first error: {result['first_error']}", file=sys.stderr)
+
+
+def find_regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    def key(result):
+        return result["target"], result.get("format"), result.get("pages"), result["concurrency"]
+
+    def label(result):
+        return " ".join(str(part) for part in key(result) if part is not None)
+
+    previous = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get(key(result))
+        if base is None:
+            continue
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{label(result)}: errors {base['errors']} -> {result['errors']}")
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            if metric not in result or metric not in base:
+                continue
+            change = (result[metric] - base[metric]) / base[metric] if base[metric] else 0
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{label(result)}: {metric} {base[metric]} -> {result[metric]} ({change:+.0%})")
+    return regressions
+
+
+# Processes
+
+def run_child(args: argparse.Namespace) -> None:
+    """Run one target at one document size in this process and print its result."""
+    before = upstream_requests(args.base_url)
+    if args.target.startswith("flask"):
+        latencies, errors, wall, cache_hits = bench_flask(args.target, args.fixture, args.requests, args.concurrency)
+    else:
+        latencies, errors, wall, cache_hits = bench_chainlit(args.target, args.fixture, args.requests, args.concurrency)
+    result = summarize_run(latencies, errors, wall)
+    result.update(
+        cache_hits=cache_hits,
+        peak_rss_mb=round(peak_rss_mb(resource.RUSAGE_SELF), 1),
+        children_rss_mb=round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        llm_requests=upstream_requests(args.base_url) - before,
+    )
+    # The parent reads the last line; the apps may have printed before it
+    print("RESULT " + json.dumps(result), flush=True)
+
+
+def start_stub(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    stub = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.stub_server", "--port", "0",
+            "--latency", str(args.latency), "--token-rate", str(args.token_rate), "--reply-tokens", str(args.reply_tokens),
+        ],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    return stub, stub.stdout.readline().strip()
+
+
+def run_size(args: argparse.Namespace, base_url: str, fmt: Optional[str], pages: Optional[int]) -> Dict[str, Any]:
+    fixture = fixture_path(args.fixtures_dir, fmt, pages) if fmt else None
+    with tempfile.TemporaryDirectory(prefix="benchmark-cache-") as cache_dir:
+        env = dict(os.environ, OPENAI_API_KEY="benchmark", OPENAI_BASE_URL=base_url, CACHE_DIR=cache_dir)
+        if not args.cache:
+            # Every cache a request could be answered from: the persistent
+            # summary and OCR caches and the in-memory chat response cache
+            env["CACHE_MAX_BYTES"] = "0"
+            env["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+        env.setdefault("LLM_REQUESTS_PER_MINUTE", "1e9")
+        env.setdefault("LLM_TOKENS_PER_MINUTE", "1e12")
+        command = [
+            sys.executable, "-m", "benchmarks.run", args.target, "--child", "--base-url", base_url,
+            "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        ]
+        if fixture:
+            command += ["--fixture", fixture]
+        completed = subprocess.run(command, cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+    if completed.returncode or not lines:
+        result = {"ok": 0, "errors": args.requests, "first_error": f"benchmark process exited with status {completed.returncode}"}
+    else:
+        result = json.loads(lines[-1][len("RESULT "):])
+    return dict(target=args.target, format=fmt, pages=pages, concurrency=args.concurrency, requests=args.requests, **result)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("target", choices=TARGETS)
+    parser.add_argument("--requests", type=int, default=50, help="requests per document size")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--format", help="document format for upload targets (default: the target's first)")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100], help="document sizes for upload targets")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50, help="stub tokens per second, 0 for instant")
+    parser.add_argument("--reply-tokens", type=int, default=50, help="stub tokens per reply")
+    parser.add_argument("--cache", action="store_true", help="keep the summary, OCR and chat response caches enabled")
+    parser.add_argument("--fixtures-dir", default=os.path.join(REPO_ROOT, ".cache", "benchmark-fixtures"))
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default: 0.2)")
+    parser.add_argument("--base-url", help="use a running stub instead of starting one")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args)
+        return 0
+
+    formats = TARGETS[args.target]
+    fmt = args.format or (formats[0] if formats else None)
+    if formats and fmt not in formats:
+        parser.error(f"{args.target} accepts {', '.join(formats)} documents, not {fmt}")
+    sizes = args.pages if formats else [None]
+
+    stub, base_url = (None, args.base_url) if args.base_url else start_stub(args)
+    try:
+        results = [run_size(args, base_url, fmt, pages) for pages in sizes]
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""A local OpenAI-compatible chat completion server with simulated timing.
+
+Every request waits ``latency`` seconds (time to first token), then produces
+up to ``reply_tokens`` tokens at ``tokens_per_second``, streamed or not. Run
+it on its own to point the apps at it::
+
+    python -m benchmarks.stub_server --port 8765 --latency 0.5 --token-rate 40
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python app.py
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words the replies are made of, one token each
+_WORDS = "the quick brown fox jumps over the lazy dog while the model thinks".split()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2, tokens_per_second: float = 50, reply_tokens: int = 50):
+        """
+        :param port: Port to listen on (0 picks a free one)
+        :param latency: Seconds before the first token
+        :param tokens_per_second: Rate tokens are produced at (0 for instant)
+        :param reply_tokens: Tokens per reply, capped by the request's ``max_tokens``
+        """
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.request_count = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count_request(self) -> int:
+        with self._counter_lock:
+            self.request_count += 1
+            return self.request_count
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        # Health check, also reporting how many completions were served
+        self._send_json({"status": "ok", "requests": self.server.request_count})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        request_id = f"chatcmpl-stub-{self.server.count_request()}"
+        count = min(self.server.reply_tokens, body.get("max_tokens") or self.server.reply_tokens)
+        tokens = [word if i == 0 else f" {word}" for i, word in zip(range(count), itertools.cycle(_WORDS))]
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 4 for m in body.get("messages", []))
+        delay = 1 / self.server.tokens_per_second if self.server.tokens_per_second else 0
+        model = body.get("model", "stub")
+
+        time.sleep(self.server.latency)
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(delay)
+                self._send_event(_chunk(request_id, model, {"content": token}, None))
+            self._send_event(_chunk(request_id, model, {}, "stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+        else:
+            time.sleep(delay * len(tokens))
+            self._send_json({
+                "id": request_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+            })
+
+    def _send_json(self, data, status: int = 200):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def _chunk(request_id: str, model: str, delta: dict, finish_reason):
+    return {
+        "id": request_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50, help="tokens per second, 0 for instant")
+    parser.add_argument("--reply-tokens", type=int, default=50, help="tokens per reply")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency, args.token_rate, args.reply_tokens)
+    # The first line tells a parent process where to connect
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
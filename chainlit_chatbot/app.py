@@ -1,16 +1,29 @@
 # Chainlit Crash Course: Building Conversational AI Applications
 
+import asyncio
 import os
+import sys
 import chainlit as cl  # Import the Chainlit library
-from openai import OpenAI
 from dotenv import load_dotenv
-from langchain.document_loaders import PyPDFLoader
-from pptx import Presentation
-import csv
-import io
+import json
 import logging
-from typing import List, Dict, Tuple
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Tuple
+from openai import RateLimitError
+
+# Make the shared modules at the repository root importable when Chainlit runs
+# this file directly (e.g. `chainlit run chainlit_chatbot/app.py`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from common.cache import Cache, hash_bytes, hash_file
+from common.filetypes import FileHandler, describe_supported, detect_file_type, load_file_handler_modules
+from common.history import ConversationMemory
+from common.ingest import ChunkBuffer, ExtractionPool, text_splitter
+from common.llm import SUMMARY_MODEL, SUMMARY_PROMPT, LLMGateway
+from common.metrics import MetricsMiddleware, metrics
+from common.retrieval import BM25Index
+from common.scheduler import RateLimitScheduler
+from common.summarize import map_reduce_summarize
 
 # Set up logging for debugging purposes
 logging.basicConfig(level=logging.DEBUG)
@@ -19,15 +32,74 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize OpenAI client with API key from environment variables
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Per-stage latency and token metrics, served at /metrics on Chainlit's server
+if config.METRICS_ENABLED:
+    from chainlit.server import app as chainlit_server
+
+    # A middleware rather than a route: Chainlit serves its frontend from a
+    # catch-all route registered before this module is loaded
+    chainlit_server.add_middleware(MetricsMiddleware)
+    metrics.enable()
+
+# Persistent cache for document and chunk summaries, shared across sessions
+summary_cache = Cache(os.path.join(config.CACHE_DIR, "summaries.sqlite3"), config.CACHE_MAX_BYTES)
+
+# Initialize the LLM gateway shared with the Flask app, with API key from
+# environment variables. Its async client keeps slow completions from blocking
+# the event loop that every other chat session on this worker shares.
+# OPENAI_BASE_URL lets the app point at any OpenAI-compatible server (e.g. a
+# local stub for testing). Its scheduler keeps requests within the provider's
+# rate limits, answering chat messages ahead of queued document summaries.
+gateway = LLMGateway(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    timeout=config.LLM_TIMEOUT,
+    connect_timeout=config.LLM_CONNECT_TIMEOUT,
+    max_connections=config.LLM_MAX_CONNECTIONS,
+    cache=summary_cache,
+    scheduler=RateLimitScheduler(
+        config.LLM_REQUESTS_PER_MINUTE / config.LLM_PROCESSES,
+        config.LLM_TOKENS_PER_MINUTE / config.LLM_PROCESSES,
+        max_retries=config.LLM_MAX_RETRIES,
+        background_reserve=config.LLM_BACKGROUND_RESERVE
+    )
+)
+
+# Worker processes that parse uploaded files off the event loop, OCR'ing
+# scanned PDF pages; OCR'd text is cached per page across uploads
+extraction_pool = ExtractionPool(
+    max_workers=config.EXTRACT_WORKERS,
+    timeout=config.EXTRACT_TIMEOUT,
+    ocr_dpi=config.OCR_DPI,
+    ocr_min_chars=config.OCR_MIN_CHARS,
+    ocr_cache=Cache(os.path.join(config.CACHE_DIR, "ocr.sqlite3"), config.CACHE_MAX_BYTES)
+)
+
+# Size of the chunks summarized one by one in large documents
+SUMMARY_CHUNK_SIZE = 4000
+
+# Size of the chunks of the retrieval index; small chunks keep each
+# question's context short
+RETRIEVAL_CHUNK_SIZE = 1000
+
+# Additional document formats, see common/filetypes.py
+load_file_handler_modules(config.FILE_HANDLER_MODULES)
 
 # Chainlit Concept: Chat Start Event
 # This function is called when a new chat session starts
 @cl.on_chat_start
 async def start():
-    # Initialize an empty conversation history when a new chat starts
-    cl.user_session.set("conversation_history", [])
+    # Initialize an empty conversation history when a new chat starts; it
+    # keeps recent turns within a token budget and summarizes older ones
+    cl.user_session.set("conversation_memory", ConversationMemory(
+        max_tokens=config.HISTORY_MAX_TOKENS,
+        min_recent_turns=config.HISTORY_MIN_TURNS
+    ))
+    # Uploaded documents are indexed here instead of being added to the history
+    cl.user_session.set("document_index", BM25Index())
+    # Tabular files (CSV) are profiled on upload and searched row by row on
+    # each question
+    cl.user_session.set("tabular_files", [])
     
     # Chainlit Concept: Sending Messages
     # Use cl.Message to send a message to the user
@@ -39,124 +111,162 @@ async def start():
 async def main(message: cl.Message):
     # Chainlit Concept: User Session
     # Retrieve conversation history from the user's session
-    conversation_history: List[Dict[str, str]] = cl.user_session.get("conversation_history", [])
+    conversation_memory: ConversationMemory = cl.user_session.get("conversation_memory")
+    document_index: BM25Index = cl.user_session.get("document_index")
+    tabular_files: List[Tuple[str, str, FileHandler]] = cl.user_session.get("tabular_files")
     
     # Helper function to process uploaded files
-    async def process_file(file: cl.File) -> Tuple[str, str]:
-        logger.info(f"Processing file: {file.name}")
+    # It returns the file's chunks for the retrieval index and its summary
+    async def process_file(file: cl.File, handler: FileHandler) -> Tuple[List[str], str]:
+        logger.info(f"Processing {handler.name} file: {file.name}")
         try:
-            # Process different file types (PDF, PPT, CSV)
-            if file.name.lower().endswith('.pdf'):
-                loader = PyPDFLoader(file.path)
-                pages = loader.load_and_split()
-                file_content = "\n\n".join(page.page_content for page in pages)
-                logger.info(f"Extracted {len(pages)} pages from PDF, total length: {len(file_content)} characters")
-                
-                # Split the content into chunks
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=4000, chunk_overlap=200)
-                chunks = text_splitter.split_text(file_content)
-                
-                # Summarize each chunk
-                chunk_summaries = []
-                for i, chunk in enumerate(chunks):
-                    chunk_summary = generate_summary(chunk)
-                    chunk_summaries.append(f"Chunk {i+1} Summary: {chunk_summary}")
-                
-                # Combine chunk summaries
-                combined_summary = "\n\n".join(chunk_summaries)
-                
-                # Generate a final summary of the combined summaries
-                final_summary = generate_summary(combined_summary)
-                
-                logger.info(f"Generated summary for large PDF, final summary length: {len(final_summary)} characters")
-            elif file.name.lower().endswith(('.ppt', '.pptx')):
-                prs = Presentation(file.path)
-                file_content = "\n\n".join(shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, 'text'))
-                logger.info(f"Extracted content from PPT, total length: {len(file_content)} characters")
-                final_summary = generate_summary(file_content)
-            elif file.name.lower().endswith('.csv'):
-                csv_content = []
-                encodings = ['utf-8', 'iso-8859-1', 'windows-1252']
-                for encoding in encodings:
-                    try:
-                        with open(file.path, 'r', newline='', encoding=encoding) as csvfile:
-                            csv_reader = csv.reader(csvfile)
-                            for row in csv_reader:
-                                csv_content.append(", ".join(row))
-                        file_content = "\n".join(csv_content)
-                        logger.info(f"Extracted content from CSV using {encoding} encoding, total length: {len(file_content)} characters")
-                        break
-                    except UnicodeDecodeError:
-                        if encoding == encodings[-1]:
-                            raise ValueError(f"Unable to decode CSV file with any of the attempted encodings: {', '.join(encodings)}")
-                        continue
-                final_summary = generate_summary(file_content)
-            else:
-                raise ValueError("Unsupported file type. Please upload a PDF, PPT, or CSV file.")
-
-            if not file_content.strip():
+            # A re-uploaded document is served straight from the cache
+            document_key = hash_bytes("document-chunks", SUMMARY_MODEL, SUMMARY_PROMPT, await asyncio.to_thread(hash_file, file.path))
+            cached = await asyncio.to_thread(summary_cache.get, document_key)
+            if cached is not None:
+                logger.info(f"Serving cached summary for file: {file.name}")
+                cached = json.loads(cached)
+                return cached["chunks"], cached["summary"]
+
+            # Stream the file's text (e.g. PDF pages, parsed in batches across
+            # the process pool) through an incremental splitter into the
+            # summarizer: only a few chunks are held in memory, and chunk
+            # summaries start while the rest of the file is being parsed
+            index_chunks = []
+            summary_splitter = text_splitter(SUMMARY_CHUNK_SIZE, 200)
+            retrieval_splitter = text_splitter(RETRIEVAL_CHUNK_SIZE, 100)
+
+            async def summary_chunks():
+                buffer = ChunkBuffer(summary_splitter.split_text, SUMMARY_CHUNK_SIZE)
+                async for text in handler.iter_texts(file.path, extraction_pool):
+                    for chunk in buffer.feed(text):
+                        with metrics.span("split"):
+                            index_chunks.extend(retrieval_splitter.split_text(chunk))
+                        yield chunk
+                for chunk in buffer.flush():
+                    with metrics.span("split"):
+                        index_chunks.extend(retrieval_splitter.split_text(chunk))
+                    yield chunk
+
+            # Summarize the chunks concurrently, then reduce the chunk
+            # summaries level by level into one final summary
+            final_summary = await map_reduce_summarize(
+                summary_chunks(),
+                generate_summary,
+                concurrency=config.SUMMARY_CONCURRENCY,
+                fan_in=config.SUMMARY_FAN_IN
+            )
+
+            if not index_chunks:
                 raise ValueError("No content could be extracted from the file.")
-        
-            return file_content, final_summary
+
+            logger.info(f"Generated summary for {handler.name} with {len(index_chunks)} chunks, final summary length: {len(final_summary)} characters")
+            await asyncio.to_thread(summary_cache.set, document_key, json.dumps({"chunks": index_chunks, "summary": final_summary}))
+            return index_chunks, final_summary
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}", exc_info=True)
             raise
 
+    # Helper function to process one uploaded file and report on it
+    async def handle_file(element, semaphore: asyncio.Semaphore):
+        # The format is recognized from the content first, then the name
+        handler = None
+        if isinstance(element, cl.File) and element.path:
+            handler = await asyncio.to_thread(detect_file_type, element.name, element.mime, element.path)
+        if handler is None:
+            await cl.Message(content=f"❌ Unsupported file type for '{element.name}'. Please upload a {describe_supported()} file.").send()
+            return
+
+        async with semaphore:
+            # Chainlit Concept: Updating Messages
+            # Show a progress message per file and replace it with the result
+            progress = cl.Message(content=f"⏳ Processing '{element.name}'...")
+            await progress.send()
+            try:
+                chunks, summary = await process_file(element, handler)
+                # Only the summary stays in the history; the content is
+                # indexed and retrieved chunk by chunk when relevant
+                document_index.add(chunks, source=element.name)
+                if handler.tabular:
+                    tabular_files.append((element.name, element.path, handler))
+                conversation_memory.append("system", f"{handler.name} '{element.name}' Summary: {summary}")
+                progress.content = f"📄 File '{element.name}' processed. Here's a summary:\n\n{summary}\n\nYou can now ask questions about this document."
+            except Exception as e:
+                progress.content = f"❌ Error processing file '{element.name}': {str(e)}"
+            await progress.update()
+
     # Chainlit Concept: Handling File Uploads
-    # Check if the message contains any uploaded files
+    # Process every uploaded file concurrently, a bounded number at a time;
+    # each file's result is shown as soon as it is ready
     if message.elements:
-        for element in message.elements:
-            if isinstance(element, cl.File) and (element.mime in ["application/pdf", "application/vnd.openxmlformats-officedocument.presentationml.presentation", "text/csv"] or element.name.lower().endswith('.csv')):
-                try:
-                    file_content, summary = await process_file(element)
-                    file_type = "PDF" if element.mime == "application/pdf" else "PPT" if element.mime == "application/vnd.openxmlformats-officedocument.presentationml.presentation" else "CSV"
-                    conversation_history.append({"role": "system", "content": f"{file_type} Content: {file_content}\n\nSummary: {summary}"})
-                    await cl.Message(content=f"📄 File '{element.name}' processed. Here's a summary:\n\n{summary}\n\nYou can now ask questions about this document.").send()
-                except Exception as e:
-                    await cl.Message(content=f"❌ Error processing file: {str(e)}").send()
-                return
-            else:
-                await cl.Message(content="❌ Unsupported file type. Please upload a PDF, PPT, or CSV file.").send()
-                return
+        semaphore = asyncio.Semaphore(config.UPLOAD_CONCURRENCY)
+        await asyncio.gather(*(handle_file(element, semaphore) for element in message.elements))
+        return
+
+    # Fold the oldest turns into the running summary once the history is over
+    # its token budget, before the prompt is built so that it stays within it
+    await conversation_memory.afold(generate_summary)
 
     # Add user message to conversation history
-    conversation_history.append({"role": "user", "content": message.content})
+    conversation_memory.append("user", message.content)
 
-    # Generate response using OpenAI
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=conversation_history,
-        max_tokens=300
-    )
+    # Send the model only the document chunks relevant to this question
+    messages = conversation_memory.to_messages()
+    with metrics.span("retrieve"):
+        relevant_chunks = document_index.search(message.content, top_k=config.RETRIEVAL_TOP_K)
+        matching_rows = await asyncio.gather(
+            *(handler.lookup_rows(path, message.content, config.CSV_LOOKUP_ROWS, extraction_pool) for _, path, handler in tabular_files),
+            return_exceptions=True
+        )
+    for (name, _, _), rows in zip(tabular_files, matching_rows):
+        if isinstance(rows, Exception):
+            logger.warning(f"Row lookup failed for file {name}: {rows}")
+        elif rows:
+            relevant_chunks.append((f"{name}, matching rows", rows))
+    if relevant_chunks:
+        context = "\n\n".join(f"[{source}]\n{chunk}" for source, chunk in relevant_chunks)
+        messages = messages[:-1] + [
+            {"role": "system", "content": f"Relevant document excerpts:\n\n{context}"},
+            messages[-1]
+        ]
+
+    # Chainlit Concept: Streaming Messages
+    # Create an empty message and stream the reply into it token by token
+    assistant_message = cl.Message(content="")
+
+    # Generate response using OpenAI, streamed so the first tokens show up
+    # as soon as the model produces them
+    try:
+        async for token in gateway.astream(messages, max_tokens=300):
+            await assistant_message.stream_token(token)
+    except RateLimitError:
+        # Only raised once the scheduler has run out of retries
+        logger.warning("Rate limited by the LLM provider, giving up on this message")
+        conversation_memory.messages.pop()
+        await cl.Message(content="❌ The assistant is busy right now, please try again in a moment.").send()
+        return
 
-    # Extract assistant's reply
-    assistant_message = response.choices[0].message
-    conversation_history.append({"role": "assistant", "content": assistant_message.content})
+    conversation_memory.append("assistant", assistant_message.content)
     
     # Chainlit Concept: Updating User Session
     # Store the updated conversation history in the user's session
-    cl.user_session.set("conversation_history", conversation_history)
+    cl.user_session.set("conversation_memory", conversation_memory)
 
-    # Send the assistant's reply to the user
-    await cl.Message(content=assistant_message.content).send()
+    # Finalize the streamed reply
+    await assistant_message.send()
 
 # Helper function to generate summaries
-def generate_summary(text):
+async def generate_summary(text):
     """
     Generate a summary of the given text using OpenAI's GPT-4 model.
     
+    Summaries are cached, and identical requests in flight at the same time
+    are sent upstream only once (see ``LLMGateway``).
+    
     :param text: The text to summarize
     :return: A summary of the text
     """
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that summarizes documents."},
-            {"role": "user", "content": f"Please summarize the following text in about 3-4 sentences:\n\n{text}"}
-        ],
-        max_tokens=150
-    )
-    return response.choices[0].message.content
+    return await gateway.asummarize(text)
 
 # Chainlit Concept: Running the App
 if __name__ == "__main__":
@@ -0,0 +1,2 @@
+"""Helpers shared by the Flask app (``app.py``) and the Chainlit app
+(``chainlit_chatbot/app.py``)."""
@@ -0,0 +1,112 @@
+"""Persistent, content-addressed cache for extracted text and summaries."""
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+
+
+def hash_bytes(*parts) -> str:
+    """
+    Return the SHA-256 hex digest of the given parts.
+
+    :param parts: ``str`` or ``bytes`` values; strings are UTF-8 encoded
+    :return: A hex digest identifying the combination of parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        # Length-prefix every part so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's bytes."""
+    with open(path, "rb") as f:
+        return hash_stream(f)
+
+
+def hash_stream(stream: BinaryIO, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a binary stream, read in blocks."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(block_size), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+class Cache:
+    """
+    A size-bounded key/value store backed by SQLite.
+
+    Keys are content hashes (see ``hash_bytes``), values are strings or bytes.
+    When the total size of the stored values exceeds ``max_bytes`` the least
+    recently used entries are evicted. Every operation opens its own connection, so one
+    cache file can be shared by threads and by worker processes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        """Return the value stored under ``key``, or ``None`` on a miss."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, value: Union[str, bytes]) -> None:
+        """Store ``value`` under ``key`` and evict old entries if over budget."""
+        size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._evict(conn)
+
+    def delete(self, key: str) -> None:
+        """Remove ``key`` from the cache."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
@@ -0,0 +1,194 @@
+"""Streaming CSV profiling and row lookup.
+
+Instead of sending every row of a CSV to the model, the file is described by a
+compact per-column profile, and rows relevant to a question are looked up on
+demand. Both read the file in a single streaming pass.
+"""
+
+import codecs
+import csv
+import heapq
+import io
+from collections import Counter
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from common.retrieval import tokenize
+
+# Cell values treated as missing
+NULL_TOKENS = np.array(["", "na", "n/a", "nan", "null", "none", "-"])
+
+# Words too common to be useful when matching rows against a question
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "what", "which", "who", "how", "many", "much",
+    "with", "that", "this", "from", "have", "has", "does", "did", "show", "list", "rows",
+    "row", "column", "columns", "value", "values", "there", "their", "where", "when",
+}
+
+
+def detect_encoding(path: str, sample_size: int = 64 * 1024) -> str:
+    """
+    Guess the text encoding of a file from one sampled read.
+
+    :param path: Path of the file
+    :param sample_size: Number of bytes read from the start of the file
+    :return: ``utf-8-sig``, ``utf-8``, ``windows-1252`` or ``iso-8859-1``
+    """
+    with open(path, "rb") as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for encoding in ("utf-8", "windows-1252"):
+        try:
+            # An incremental decoder tolerates a character cut at the sample end
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    # Every byte sequence is valid ISO-8859-1
+    return "iso-8859-1"
+
+
+def _open_rows(path: str, encoding: str) -> Tuple[io.TextIOWrapper, Iterator[List[str]]]:
+    f = open(path, "r", newline="", encoding=encoding, errors="replace")
+    sample = f.read(64 * 1024)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    return f, csv.reader(f, dialect)
+
+
+class ColumnProfile:
+    """Running statistics of one CSV column, updated a chunk of rows at a time."""
+
+    def __init__(self, name: str, max_distinct: int = 10000):
+        self.name = name
+        self.max_distinct = max_distinct
+        self.count = 0
+        self.nulls = 0
+        self.numeric = True
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.categories: Counter = Counter()
+        self.truncated = False
+
+    def update(self, values: np.ndarray) -> None:
+        """Fold a chunk of raw cell values (a NumPy string array) into the profile."""
+        stripped = np.char.strip(values)
+        present = stripped[~np.isin(np.char.lower(stripped), NULL_TOKENS)]
+        self.count += len(values)
+        self.nulls += len(values) - len(present)
+        if not len(present):
+            return
+
+        if self.numeric:
+            try:
+                numbers = present.astype(np.float64)
+            except ValueError:
+                self.numeric = False
+            else:
+                self.total += numbers.sum()
+                self.total_squares += np.square(numbers).sum()
+                self.minimum = min(self.minimum, numbers.min())
+                self.maximum = max(self.maximum, numbers.max())
+
+        labels, counts = np.unique(present, return_counts=True)
+        for label, count in zip(labels.tolist(), counts.tolist()):
+            if label in self.categories or len(self.categories) < self.max_distinct:
+                self.categories[label] += count
+            else:
+                self.truncated = True
+
+    def describe(self, top_k: int = 5) -> str:
+        present = self.count - self.nulls
+        distinct = f"{len(self.categories)}{'+' if self.truncated else ''} distinct"
+        if self.numeric and present:
+            mean = self.total / present
+            std = np.sqrt(max(self.total_squares / present - mean ** 2, 0.0))
+            return (f"- {self.name} (numeric): {self.nulls} nulls, {distinct}, "
+                    f"min {self.minimum:g}, max {self.maximum:g}, mean {mean:g}, std {std:g}")
+        top = ", ".join(f"{label} ({count})" for label, count in self.categories.most_common(top_k))
+        return f"- {self.name} (text): {self.nulls} nulls, {distinct}, top values: {top or 'none'}"
+
+
+def profile_csv(path: str, chunk_rows: int = 10000, top_k: int = 5) -> str:
+    """
+    Profile a CSV file and describe it in a few lines of text.
+
+    The file is parsed in chunks of ``chunk_rows`` rows; only one chunk is held
+    in memory at a time. Each column gets its null count and number of
+    distinct values, plus min/max/mean/std for numeric columns or the most
+    frequent values for text columns. The first row is taken as the header.
+
+    :param path: Path of the CSV file
+    :param chunk_rows: Number of rows parsed and profiled at once
+    :param top_k: Number of most frequent values listed per text column
+    :return: The profile, ready to be summarized or added to a prompt
+    """
+    encoding = detect_encoding(path)
+    f, rows = _open_rows(path, encoding)
+    with f:
+        header = next(rows, None)
+        if not header:
+            return ""
+        columns = [ColumnProfile(name.strip() or f"column {i+1}") for i, name in enumerate(header)]
+        row_count = 0
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                break
+            row_count += len(chunk)
+            width = len(columns)
+            # Pad or cut ragged rows to the header's width
+            table = np.array([(row + [""] * width)[:width] for row in chunk], dtype=str)
+            for i, column in enumerate(columns):
+                column.update(table[:, i])
+
+    lines = [f"CSV profile: {row_count} rows, {len(columns)} columns (encoding: {encoding})"]
+    lines.extend(column.describe(top_k) for column in columns)
+    return "\n".join(lines)
+
+
+def lookup_csv_rows(path: str, question: str, limit: int = 20) -> Optional[str]:
+    """
+    Find the rows of a CSV file that best match a question.
+
+    Rows are ranked by how many distinct words of the question they contain;
+    the file is scanned in one streaming pass, keeping only the best ``limit``
+    rows.
+
+    :param path: Path of the CSV file
+    :param question: The user's question
+    :param limit: Maximum number of rows returned
+    :return: The header and matching rows as CSV text, or ``None`` if no row matches
+    """
+    terms = {term for term in tokenize(question) if len(term) > 2 and term not in _STOPWORDS}
+    if not terms:
+        return None
+    f, rows = _open_rows(path, detect_encoding(path))
+    with f:
+        header = next(rows, None)
+        best: List[Tuple[int, int, List[str]]] = []
+        for index, row in enumerate(rows):
+            score = len(terms.intersection(tokenize(" ".join(row))))
+            if not score:
+                continue
+            # Keep the highest scores; among equal scores, the earliest rows
+            item = (score, -index, row)
+            if len(best) < limit:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+    if not best:
+        return None
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header or [])
+    writer.writerows(row for _, _, row in sorted(best, key=lambda item: -item[1]))
+    return out.getvalue()
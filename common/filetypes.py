@@ -0,0 +1,266 @@
+"""Registry of the document formats the apps accept.
+
+Each format is a ``FileHandler``: how to recognize a file (content first,
+then extension and MIME type) and how to read its text. Handlers import their
+parser only when a file of their format is read, mostly inside extraction
+workers, so adding a format costs nothing at startup.
+
+New formats plug in with ``register_file_handler``, from a module listed in
+the ``FILE_HANDLER_MODULES`` setting::
+
+    class MarkdownHandler(TextHandler):
+        name = "Markdown"
+        extensions = (".md",)
+        mime_types = ("text/markdown",)
+
+    register_file_handler(MarkdownHandler())
+"""
+
+import asyncio
+import importlib
+import io
+import zipfile
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from common.ingest import ExtractionPool, extract_docx_text, extract_pptx_text, iter_pdf_pages
+
+# Bytes read from the start of a file to recognize its format
+HEAD_SIZE = 4096
+
+# Text is read in blocks of this many characters
+_TEXT_BLOCK_SIZE = 64 * 1024
+
+
+def call(module: str, function: str, *args):
+    """
+    Import ``module`` and call its ``function``.
+
+    Submitted to the extraction pool instead of the function itself, so the
+    module is only ever imported in the worker processes.
+    """
+    return getattr(importlib.import_module(module), function)(*args)
+
+
+class FileHandler(ABC):
+    """A document format: how to recognize it and how to read its text."""
+
+    # Name shown to users, e.g. "PDF"
+    name: str = ""
+    extensions: Tuple[str, ...] = ()
+    mime_types: Tuple[str, ...] = ()
+    # Leading bytes of every file of the format, if it has any
+    magic: Optional[bytes] = None
+    # Whether the file holds rows to look up on each question (see ``lookup_rows``)
+    tabular = False
+
+    def sniff(self, head: bytes, source: Union[str, BinaryIO, None]) -> Optional[bool]:
+        """
+        Recognize the format from the file's first bytes.
+
+        :param source: Path or seekable stream of the whole file, for formats
+            that need more than ``head``
+        :return: ``True``/``False`` if the content decides, ``None`` if only
+            the name and MIME type can (plain text formats)
+        """
+        if self.magic is None:
+            return None
+        return head.startswith(self.magic)
+
+    def matches_name(self, name: str, mime: Optional[str]) -> bool:
+        return name.lower().endswith(self.extensions) or (mime or "").split(";")[0] in self.mime_types
+
+    @abstractmethod
+    def iter_texts(self, path: str, pool: ExtractionPool) -> AsyncIterator[str]:
+        """Yield the text of the file at ``path`` piece by piece (e.g. page by page)."""
+
+    def iter_stream_texts(self, stream: BinaryIO) -> Optional[Iterator[str]]:
+        """
+        Read a small in-memory file in this process, or return ``None`` if the
+        format can only be read from a path.
+        """
+        return None
+
+    async def lookup_rows(self, path: str, question: str, limit: int, pool: ExtractionPool) -> Optional[str]:
+        """Return the rows of a tabular file that match ``question``."""
+        return None
+
+
+class PdfHandler(FileHandler):
+    name = "PDF"
+    extensions = (".pdf",)
+    mime_types = ("application/pdf",)
+    magic = b"%PDF-"
+
+    def sniff(self, head, source):
+        # The header may follow some junk bytes, which readers tolerate
+        return self.magic in head[:1024]
+
+    async def iter_texts(self, path, pool):
+        async for page in pool.iter_pdf_pages(path):
+            yield page
+
+    def iter_stream_texts(self, stream):
+        return iter_pdf_pages(stream)
+
+
+class OfficeHandler(FileHandler):
+    """An Office Open XML format: a ZIP archive identified by one of its members."""
+
+    magic = b"PK\x03\x04"
+    # Archive member every file of the format has
+    member = ""
+    # Module-level function of ``common.ingest`` returning the file's text
+    extract = None
+
+    def sniff(self, head, source):
+        if not head.startswith(self.magic):
+            return False
+        if source is None:
+            return None
+        position = source.tell() if not isinstance(source, str) else None
+        try:
+            with zipfile.ZipFile(source) as archive:
+                return self.member in archive.namelist()
+        except zipfile.BadZipFile:
+            return False
+        finally:
+            if position is not None:
+                source.seek(position)
+
+    async def iter_texts(self, path, pool):
+        yield await pool.run(type(self).extract, path)
+
+
+class PptxHandler(OfficeHandler):
+    name = "PPT"
+    extensions = (".pptx",)
+    mime_types = ("application/vnd.openxmlformats-officedocument.presentationml.presentation",)
+    member = "ppt/presentation.xml"
+    extract = extract_pptx_text
+
+
+class DocxHandler(OfficeHandler):
+    name = "DOCX"
+    extensions = (".docx",)
+    mime_types = ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",)
+    member = "word/document.xml"
+    extract = extract_docx_text
+
+
+class TextHandler(FileHandler):
+    """A plain text format, recognized by name once the content looks like text."""
+
+    name = "TXT"
+    extensions = (".txt",)
+    mime_types = ("text/plain",)
+
+    def sniff(self, head, source):
+        # NUL bytes never appear in text, whatever the encoding but UTF-16/32
+        return False if b"\0" in head else None
+
+    async def iter_texts(self, path, pool):
+        # Read in a thread: the file may be large or on a slow disk
+        f = await asyncio.to_thread(open, path, encoding="utf-8", errors="replace")
+        try:
+            while block := await asyncio.to_thread(f.read, _TEXT_BLOCK_SIZE):
+                yield block
+        finally:
+            f.close()
+
+    def iter_stream_texts(self, stream):
+        reader = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+        try:
+            yield from iter(lambda: reader.read(_TEXT_BLOCK_SIZE), "")
+        finally:
+            # Leave the underlying stream open for the caller
+            reader.detach()
+
+
+class CsvHandler(TextHandler):
+    """CSV files are summarized from a column profile, and matching rows are looked up per question."""
+
+    name = "CSV"
+    extensions = (".csv",)
+    mime_types = ("text/csv", "application/csv")
+    tabular = True
+
+    async def iter_texts(self, path, pool):
+        yield await pool.run(call, "common.csv_profile", "profile_csv", path)
+
+    def iter_stream_texts(self, stream):
+        # Small uploads are profiled from a path too, never sent as raw rows
+        return None
+
+    async def lookup_rows(self, path, question, limit, pool):
+        return await pool.run(call, "common.csv_profile", "lookup_csv_rows", path, question, limit)
+
+
+_handlers: List[FileHandler] = [PdfHandler(), PptxHandler(), DocxHandler(), CsvHandler(), TextHandler()]
+
+
+def register_file_handler(handler: FileHandler, first: bool = False) -> None:
+    """Add a format; ``first`` gives it precedence over the registered ones."""
+    if first:
+        _handlers.insert(0, handler)
+    else:
+        _handlers.append(handler)
+
+
+def load_file_handler_modules(modules: Iterable[str]) -> None:
+    """Import the modules registering additional formats."""
+    for module in modules:
+        importlib.import_module(module)
+
+
+def file_handlers() -> List[FileHandler]:
+    return list(_handlers)
+
+
+def detect_file_type(name: str, mime: Optional[str] = None, source: Union[str, BinaryIO, None] = None) -> Optional[FileHandler]:
+    """
+    Return the handler of a file, or ``None`` if its format is not supported.
+
+    The content decides where it can: a PDF renamed ``.txt`` is read as a PDF,
+    and a text file named ``.pdf`` is rejected. Text formats, which have no
+    signature, are then recognized by extension or MIME type.
+
+    :param name: File name
+    :param mime: MIME type reported by the client, if any
+    :param source: Path or seekable binary stream of the content; a stream is
+        left at the position it was given at
+    """
+    head = _read_head(source) if source is not None else b""
+    candidates = []
+    for handler in _handlers:
+        recognized = handler.sniff(head, source) if source is not None else None
+        if recognized:
+            return handler
+        if recognized is None:
+            candidates.append(handler)
+    for handler in candidates:
+        if handler.matches_name(name, mime):
+            return handler
+    return None
+
+
+def supported_extensions() -> List[str]:
+    """Return the extensions of every registered format, e.g. for an ``accept`` attribute."""
+    return [extension for handler in _handlers for extension in handler.extensions]
+
+
+def describe_supported() -> str:
+    """Return the registered format names for messages, e.g. "PDF, PPT or CSV"."""
+    names = list(dict.fromkeys(handler.name for handler in _handlers))
+    return ", ".join(names[:-1]) + f" or {names[-1]}" if len(names) > 1 else "".join(names)
+
+
+def _read_head(source: Union[str, BinaryIO]) -> bytes:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read(HEAD_SIZE)
+    position = source.tell()
+    try:
+        return source.read(HEAD_SIZE)
+    finally:
+        source.seek(position)
@@ -0,0 +1,125 @@
+"""Token-budgeted conversation history with a rolling summary."""
+
+from typing import Awaitable, Callable, Dict, List, Optional
+
+Message = Dict[str, str]
+
+# Approximate per-message overhead of the chat format, in tokens
+_MESSAGE_OVERHEAD = 4
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in ``text``.
+
+    Uses ``tiktoken`` when it is installed and its encoding can be loaded,
+    otherwise falls back to the usual estimate of four characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: List[Message]) -> int:
+    """Count the tokens of a list of chat messages."""
+    return sum(count_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in messages)
+
+
+class ConversationMemory:
+    """
+    Conversation history kept within a token budget.
+
+    The most recent turns are kept verbatim. Once the history grows past
+    ``max_tokens``, the oldest turns are folded into a running summary until it
+    is back under ``target_ratio * max_tokens``. Only the evicted turns are
+    sent to the summarizer together with the previous summary, so the summary
+    is refreshed incrementally and only every few turns. System messages
+    (e.g. document summaries) are never folded.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        min_recent_turns: int = 2,
+        target_ratio: float = 0.75,
+        messages: Optional[List[Message]] = None,
+        summary: str = "",
+    ):
+        self.max_tokens = max_tokens
+        self.min_recent_turns = min_recent_turns
+        self.target_ratio = target_ratio
+        self.messages: List[Message] = list(messages or [])
+        self.summary = summary
+
+    def to_dict(self) -> dict:
+        """Return the history and summary as a JSON-serializable dict."""
+        return {"messages": self.messages, "summary": self.summary}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], **kwargs) -> "ConversationMemory":
+        """Rebuild a memory saved with ``to_dict``; ``kwargs`` set the budget."""
+        data = data or {}
+        return cls(messages=data.get("messages"), summary=data.get("summary", ""), **kwargs)
+
+    def append(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+
+    def to_messages(self) -> List[Message]:
+        """Return the messages to send to the model: summary first, then the kept turns."""
+        if not self.summary:
+            return list(self.messages)
+        return [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}] + self.messages
+
+    def token_count(self) -> int:
+        return count_message_tokens(self.to_messages())
+
+    def _take_overflow(self) -> List[Message]:
+        """Remove and return the oldest turns that no longer fit the budget."""
+        if self.token_count() <= self.max_tokens:
+            return []
+        target = int(self.max_tokens * self.target_ratio)
+        total = self.token_count()
+        # Indices of foldable (non-system) messages, oldest first, minus the
+        # most recent turns which are always kept verbatim
+        foldable = [i for i, m in enumerate(self.messages) if m["role"] != "system"]
+        foldable = foldable[:max(len(foldable) - 2 * self.min_recent_turns, 0)]
+        evicted = set()
+        for i in foldable:
+            if total <= target:
+                break
+            evicted.add(i)
+            total -= count_tokens(self.messages[i]["content"]) + _MESSAGE_OVERHEAD
+        overflow = [m for i, m in enumerate(self.messages) if i in evicted]
+        self.messages = [m for i, m in enumerate(self.messages) if i not in evicted]
+        return overflow
+
+    def _fold_text(self, overflow: List[Message]) -> str:
+        turns = "\n".join(f"{m['role']}: {m['content']}" for m in overflow)
+        if self.summary:
+            return f"Summary of the conversation so far: {self.summary}\n\nNew conversation turns:\n{turns}"
+        return f"Conversation turns:\n{turns}"
+
+    def fold(self, summarize: Callable[[str], str]) -> None:
+        """
+        Fold the turns over budget into the running summary.
+
+        :param summarize: Function returning the summary of a text
+        """
+        overflow = self._take_overflow()
+        if overflow:
+            self.summary = summarize(self._fold_text(overflow))
+
+    async def afold(self, summarize: Callable[[str], Awaitable[str]]) -> None:
+        """Async variant of ``fold`` for async summarizers."""
+        overflow = self._take_overflow()
+        if overflow:
+            self.summary = await summarize(self._fold_text(overflow))
@@ -0,0 +1,334 @@
+"""Streaming document ingestion: pages in, bounded-size text chunks out.
+
+Parsing is CPU-bound, so the extractors below are plain module-level
+functions that ``ExtractionPool`` runs in worker processes, keeping the event
+loop of the async front end responsive. Parser libraries are imported on
+first use, so a process only loads those of the formats it actually reads.
+"""
+
+import asyncio
+import functools
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import AsyncIterator, BinaryIO, Callable, Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+from common.cache import Cache, hash_bytes
+from common.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def iter_pdf_pages(source: Union[str, BinaryIO]) -> Iterator[str]:
+    """
+    Yield the text of a PDF one page at a time.
+
+    :param source: Path of the PDF or a seekable binary file object
+    """
+    if isinstance(source, str):
+        # Keep the file open instead of handing pypdf the path, which would
+        # make it read the whole file into memory up front
+        with open(source, "rb") as f:
+            yield from iter_pdf_pages(f)
+        return
+    from pypdf import PdfReader
+
+    for page in PdfReader(source).pages:
+        yield page.extract_text() or ""
+
+
+def pdf_page_count(path: str) -> int:
+    """Return the number of pages of the PDF at ``path``."""
+    from pypdf import PdfReader
+
+    with open(path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+def extract_pdf_pages(path: str, start: int, stop: int, ocr_min_chars: int = 0) -> List[Tuple[str, Optional[str]]]:
+    """
+    Return the text of pages ``start`` to ``stop - 1`` of the PDF at ``path``.
+
+    :param ocr_min_chars: Pages with less text than this that draw images or
+        forms are reported as needing OCR (0 disables the check)
+    :return: ``(text, digest)`` per page, where ``digest`` identifies the
+        content of a page that needs OCR and is ``None`` otherwise
+    """
+    from pypdf import PdfReader
+
+    with open(path, "rb") as f:
+        pages = PdfReader(f).pages
+        result = []
+        for i in range(start, min(stop, len(pages))):
+            text = pages[i].extract_text() or ""
+            digest = None
+            if len(text.strip()) < ocr_min_chars:
+                digest = _page_digest(pages[i])
+            result.append((text, digest))
+        return result
+
+
+def _page_digest(page) -> Optional[str]:
+    """Hash a page's content stream and XObjects, or ``None`` if it draws none."""
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if not xobjects:
+        return None
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects):
+        try:
+            digest.update(xobjects[name].get_object().get_data())
+        except Exception:
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def ocr_pdf_page(path: str, index: int, dpi: int) -> str:
+    """Rasterize page ``index`` of the PDF at ``path`` and return its OCR'd text."""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    images = convert_from_path(path, dpi=dpi, first_page=index + 1, last_page=index + 1)
+    return "\n".join(pytesseract.image_to_string(image) for image in images)
+
+
+def extract_pptx_text(path: str) -> str:
+    """Return the text of every shape of every slide of a PPTX file."""
+    from pptx import Presentation
+
+    prs = Presentation(path)
+    return "\n\n".join(shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, 'text'))
+
+
+def extract_docx_text(path: str) -> str:
+    """Return the text of the paragraphs and tables of a DOCX file, in document order."""
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = Document(path)
+    blocks = []
+    for element in document.element.body.iterchildren():
+        if element.tag.endswith("}p"):
+            blocks.append(Paragraph(element, document).text)
+        elif element.tag.endswith("}tbl"):
+            table = Table(element, document)
+            blocks.extend(" | ".join(cell.text for cell in row.cells) for row in table.rows)
+    return "\n".join(block for block in blocks if block.strip())
+
+
+@functools.lru_cache(maxsize=None)
+def text_splitter(chunk_size: int, chunk_overlap: int):
+    """Return a shared ``RecursiveCharacterTextSplitter``, importing langchain on first use."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+class ChunkBuffer:
+    """
+    Split a stream of texts (e.g. pages) into chunks incrementally.
+
+    Texts are buffered until about two chunks' worth has accumulated; the
+    buffer is then split and every chunk but the last is emitted, the last one
+    being carried over to be completed by the following text. At most a couple
+    of chunks are held in memory regardless of the document size.
+    """
+
+    def __init__(self, split: Callable[[str], List[str]], chunk_size: int, separator: str = "\n\n"):
+        """
+        :param split: Splitter function, e.g. ``RecursiveCharacterTextSplitter.split_text``
+        :param chunk_size: The chunk size ``split`` produces
+        :param separator: String inserted between consecutive texts
+        """
+        self.split = split
+        self.chunk_size = chunk_size
+        self.separator = separator
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add the next text and return the chunks that are now complete."""
+        if not text.strip():
+            return []
+        self._buffer = f"{self._buffer}{self.separator}{text}" if self._buffer else text
+        if len(self._buffer) < 2 * self.chunk_size:
+            return []
+        with metrics.span("split"):
+            chunks = self.split(self._buffer)
+        self._buffer = chunks[-1] if chunks else ""
+        return chunks[:-1]
+
+    def flush(self) -> List[str]:
+        """Return the remaining chunks at the end of the stream."""
+        buffer, self._buffer = self._buffer, ""
+        if not buffer.strip():
+            return []
+        with metrics.span("split"):
+            return self.split(buffer)
+
+
+def iter_chunks(
+    texts: Iterable[str],
+    split: Callable[[str], List[str]],
+    chunk_size: int,
+    separator: str = "\n\n",
+) -> Iterator[str]:
+    """Split a stream of texts into chunks incrementally, see ``ChunkBuffer``."""
+    buffer = ChunkBuffer(split, chunk_size, separator)
+    for text in texts:
+        yield from buffer.feed(text)
+    yield from buffer.flush()
+
+
+class ExtractionPool:
+    """
+    A process pool for document parsing with per-file timeouts.
+
+    Every file gets a deadline of ``timeout`` seconds. When it passes, or when
+    the caller is cancelled, the file's queued work is cancelled and a
+    ``TimeoutError`` (resp. ``CancelledError``) is raised; work already running
+    in a worker finishes in the background and its result is dropped.
+
+    PDF pages without a text layer (scanned pages) are rasterized at
+    ``ocr_dpi`` and OCR'd in the pool. Their text is cached in ``ocr_cache`` by
+    page content, so a page is only ever OCR'd once.
+
+    Workers are spawned, and a spawned process re-imports the ``__main__``
+    module of its parent (as ``__mp_main__``) before running any task. Only
+    use the pool from a program whose main module keeps its startup under
+    ``if __name__ == "__main__":``. Under ``uvicorn asgi:app`` or ``chainlit
+    run`` that module is the launcher's; the development server ``python
+    app.py`` has each worker build app.py's shared objects once, at startup,
+    and never use them.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: float = 120,
+        ocr_dpi: int = 300,
+        ocr_min_chars: int = 10,
+        ocr_cache: Optional[Cache] = None,
+    ):
+        """
+        :param max_workers: Number of worker processes (default: one per CPU)
+        :param timeout: Seconds allowed for extracting one file
+        :param ocr_dpi: Resolution scanned pages are rasterized at
+        :param ocr_min_chars: Pages with less text are OCR'd (0 disables OCR)
+        :param ocr_cache: Cache for the OCR'd text of pages
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ocr_dpi = ocr_dpi
+        self.ocr_min_chars = ocr_min_chars
+        self.ocr_cache = ocr_cache
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # The pool is created by whichever thread needs it first
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Created on first use; "spawn" avoids forking a process that is
+        # running an event loop and other threads
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _submit(self, stage: str, fn: Callable, *args) -> Future:
+        """Submit ``fn(*args)`` to the pool, timing it as ``stage`` from submission to completion."""
+        future = self.executor.submit(fn, *args)
+        if metrics.enabled:
+            start = time.perf_counter()
+            future.add_done_callback(
+                lambda f: f.cancelled() or metrics.record(stage, time.perf_counter() - start, error=f.exception() is not None)
+            )
+        return future
+
+    async def _await(self, future: Future, deadline: float):
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timed out after {self.timeout:g}s extracting text from the file.") from None
+
+    async def run(self, fn: Callable, *args):
+        """Run ``fn(*args)`` in the pool, within the per-file timeout."""
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        return await self._await(self._submit("extract", fn, *args), deadline)
+
+    async def iter_pdf_pages(self, path: str, batch_size: int = 16, prefetch: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Yield the text of a PDF page by page, parsed in parallel batches.
+
+        At most ``prefetch`` batches (default: one per worker) are in flight,
+        so memory stays bounded when the consumer is slower than the pool.
+        Scanned pages of a batch are OCR'd in parallel.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        page_count = await self._await(self._submit("extract", pdf_page_count, path), deadline)
+        prefetch = prefetch or self.max_workers or multiprocessing.cpu_count()
+        starts = iter(range(0, page_count, batch_size))
+        pending: Deque[Tuple[int, Future]] = deque()
+
+        def submit(start: int) -> None:
+            future = self._submit("extract", extract_pdf_pages, path, start, start + batch_size, self.ocr_min_chars)
+            pending.append((start, future))
+
+        try:
+            for start in starts:
+                submit(start)
+                if len(pending) >= prefetch:
+                    break
+            while pending:
+                start, future = pending.popleft()
+                pages = await self._await(future, deadline)
+                next_start = next(starts, None)
+                if next_start is not None:
+                    submit(next_start)
+                texts = await asyncio.gather(*(
+                    self._ocr_page(path, start + i, digest, deadline) if digest else _done(text)
+                    for i, (text, digest) in enumerate(pages)
+                ))
+                for text in texts:
+                    yield text
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    async def _ocr_page(self, path: str, index: int, digest: str, deadline: float) -> str:
+        key = hash_bytes("ocr", digest, str(self.ocr_dpi))
+        if self.ocr_cache is not None:
+            text = await asyncio.to_thread(self.ocr_cache.get, key)
+            if text is not None:
+                return text
+        try:
+            text = await self._await(self._submit("ocr", ocr_pdf_page, path, index, self.ocr_dpi), deadline)
+        except TimeoutError:
+            raise
+        except Exception as e:
+            # A missing OCR engine or a bad page must not fail the whole file
+            logger.warning(f"OCR failed for page {index + 1} of {path}: {e}")
+            return ""
+        if self.ocr_cache is not None:
+            await asyncio.to_thread(self.ocr_cache.set, key, text)
+        return text
+
+
+async def _done(value):
+    return value
@@ -0,0 +1,304 @@
+"""Shared gateway to the OpenAI chat completion API.
+
+Both front ends go through one ``LLMGateway``: it owns pooled HTTP clients
+with explicit timeouts, caches summaries, coalesces identical requests that
+are in flight at the same time into a single upstream call and, given a
+``RateLimitScheduler``, keeps requests within the provider's rate limits.
+"""
+
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from common.cache import Cache, hash_bytes
+from common.history import count_message_tokens, count_tokens
+from common.metrics import metrics
+from common.scheduler import BACKGROUND, INTERACTIVE, RateLimitScheduler
+
+T = TypeVar("T")
+Message = Dict[str, str]
+
+# Model used by both front ends
+DEFAULT_MODEL = "gpt-4"
+
+# Model and prompts used for summaries; both are part of every cache key
+SUMMARY_MODEL = DEFAULT_MODEL
+SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant that summarizes documents."
+SUMMARY_PROMPT = "Please summarize the following text in about 3-4 sentences:\n\n{text}"
+
+
+class LLMGateway:
+    """
+    Pooled, deduplicating access to chat completions, with sync and async APIs.
+
+    The sync methods may be called from any thread. The async methods must all
+    be called from the same event loop, which the async HTTP client binds to.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: float = 60,
+        connect_timeout: float = 5,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        cache: Optional[Cache] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+    ):
+        """
+        :param api_key: OpenAI API key
+        :param base_url: URL of the API, e.g. a local OpenAI-compatible stub
+        :param timeout: Seconds allowed for reading a response
+        :param connect_timeout: Seconds allowed for opening a connection
+        :param max_connections: Connection pool size of each HTTP client
+        :param max_keepalive_connections: Idle connections kept open for reuse
+        :param cache: Cache for summaries
+        :param scheduler: Admits requests within the provider's rate limits
+            and retries rate-limited ones; without it requests go out directly
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache = cache
+        self.scheduler = scheduler
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._async_in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self) -> OpenAI:
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    # Rate-limit retries are left to the scheduler
+                    max_retries=0 if self.scheduler is not None else 2,
+                    http_client=httpx.Client(timeout=self._timeout, limits=self._limits),
+                )
+            return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0 if self.scheduler is not None else 2,
+                http_client=httpx.AsyncClient(timeout=self._timeout, limits=self._limits),
+            )
+        return self._async_client
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    # Chat completions
+
+    def complete(
+        self,
+        messages: List[Message],
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 150,
+        priority: int = INTERACTIVE,
+        stage: str = "chat",
+    ) -> str:
+        """
+        Return the model's reply to ``messages``.
+
+        :param priority: ``INTERACTIVE`` or ``BACKGROUND``, see ``RateLimitScheduler``
+        :param stage: Pipeline stage the request's time and tokens are recorded under
+        """
+        def call() -> str:
+            with metrics.span(stage) as span:
+                response = self._schedule(
+                    lambda: self.client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens),
+                    messages, max_tokens, priority
+                )
+                if span.enabled:
+                    span.add_tokens(*_usage(response, messages))
+                return response.choices[0].message.content
+        return self._single_flight(_request_key(model, messages, max_tokens), call)
+
+    async def acomplete(
+        self,
+        messages: List[Message],
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 150,
+        priority: int = INTERACTIVE,
+        stage: str = "chat",
+    ) -> str:
+        """Async variant of ``complete``."""
+        async def call() -> str:
+            with metrics.span(stage) as span:
+                response = await self._aschedule(
+                    lambda: self.async_client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens),
+                    messages, max_tokens, priority
+                )
+                if span.enabled:
+                    span.add_tokens(*_usage(response, messages))
+                return response.choices[0].message.content
+        return await self._async_single_flight(_request_key(model, messages, max_tokens), call)
+
+    def stream(
+        self,
+        messages: List[Message],
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 150,
+        priority: int = INTERACTIVE,
+        stage: str = "chat",
+    ) -> Iterator[str]:
+        """
+        Yield the model's reply to ``messages`` token by token.
+
+        Closing the generator early closes the upstream connection.
+        """
+        def call():
+            return self.client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, stream=True)
+        with metrics.span(stage) as span:
+            completion_tokens = 0
+            try:
+                with self._schedule(call, messages, max_tokens, priority) as stream:
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            completion_tokens += 1
+                            yield chunk.choices[0].delta.content
+            finally:
+                if span.enabled:
+                    span.add_tokens(count_message_tokens(messages), completion_tokens)
+
+    async def astream(
+        self,
+        messages: List[Message],
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 150,
+        priority: int = INTERACTIVE,
+        stage: str = "chat",
+    ) -> AsyncIterator[str]:
+        """Async variant of ``stream``."""
+        def call():
+            return self.async_client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, stream=True)
+        with metrics.span(stage) as span:
+            completion_tokens = 0
+            try:
+                stream = await self._aschedule(call, messages, max_tokens, priority)
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            completion_tokens += 1
+                            yield chunk.choices[0].delta.content
+            finally:
+                if span.enabled:
+                    span.add_tokens(count_message_tokens(messages), completion_tokens)
+
+    # Summaries
+
+    def summarize(self, text: str, priority: int = BACKGROUND) -> str:
+        """
+        Summarize ``text`` in a few sentences.
+
+        Summaries are cached by model, prompt and text, so unchanged chunks of
+        an edited document are not summarized again. They are background work
+        by default; pass ``INTERACTIVE`` when a user is waiting on the result.
+        """
+        key = hash_bytes("summary", SUMMARY_MODEL, SUMMARY_PROMPT, text)
+        summary = self.cache.get(key) if self.cache is not None else None
+        if summary is None:
+            summary = self.complete(_summary_messages(text), model=SUMMARY_MODEL, priority=priority, stage=_summary_stage())
+            if self.cache is not None:
+                self.cache.set(key, summary)
+        return summary
+
+    async def asummarize(self, text: str, priority: int = BACKGROUND) -> str:
+        """Async variant of ``summarize``; the cache is read and written in a thread."""
+        key = hash_bytes("summary", SUMMARY_MODEL, SUMMARY_PROMPT, text)
+        summary = await asyncio.to_thread(self.cache.get, key) if self.cache is not None else None
+        if summary is None:
+            summary = await self.acomplete(_summary_messages(text), model=SUMMARY_MODEL, priority=priority, stage=_summary_stage())
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, key, summary)
+        return summary
+
+    # Rate limiting
+
+    def _schedule(self, call: Callable[[], T], messages: List[Message], max_tokens: int, priority: int) -> T:
+        if self.scheduler is None:
+            return call()
+        return self.scheduler.run(call, count_message_tokens(messages) + max_tokens, priority)
+
+    async def _aschedule(self, call: Callable[[], Awaitable[T]], messages: List[Message], max_tokens: int, priority: int) -> T:
+        if self.scheduler is None:
+            return await call()
+        return await self.scheduler.arun(call, count_message_tokens(messages) + max_tokens, priority)
+
+    # Request coalescing
+
+    def _single_flight(self, key: str, call: Callable[[], T]) -> T:
+        """Run ``call`` unless an identical request is in flight; then share its result."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def _async_single_flight(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Async variant of ``_single_flight``."""
+        task = self._async_in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._async_in_flight[key] = task
+            task.add_done_callback(lambda _: self._async_in_flight.pop(key, None))
+        # Shielded, so a caller that gives up does not cancel the shared request
+        return await asyncio.shield(task)
+
+
+def _request_key(model: str, messages: List[Message], max_tokens: int) -> str:
+    return hash_bytes("completion", model, str(max_tokens), json.dumps(messages, sort_keys=True))
+
+
+def _summary_stage() -> str:
+    # Summaries made for a map or reduce step are recorded as part of it
+    stage = metrics.current_stage()
+    return stage if stage in ("map", "reduce") else "summary"
+
+
+def _usage(response, messages: List[Message]) -> Tuple[int, int]:
+    """Return the prompt and completion tokens of a response, estimated if the server did not report them."""
+    if response.usage is not None:
+        return response.usage.prompt_tokens, response.usage.completion_tokens
+    return count_message_tokens(messages), count_tokens(response.choices[0].message.content or "")
+
+
+def _summary_messages(text: str) -> List[Message]:
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": SUMMARY_PROMPT.format(text=text)},
+    ]
@@ -0,0 +1,292 @@
+"""Per-stage latency and token metrics in the Prometheus text format.
+
+Pipeline code wraps each stage in a span::
+
+    with metrics.span("map") as span:
+        ...
+        span.add_tokens(prompt=120, completion=40)
+
+Spans record their duration, whether they failed, and the LLM tokens spent
+in them. Nested spans of the same stage (e.g. the gateway's completion inside
+a map step) add their tokens to the outer span instead of being timed twice.
+
+Metrics are off until ``metrics.enable()`` is called. Until then ``span``
+returns a shared no-op object, so instrumented code costs one attribute check.
+"""
+
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Histogram buckets in seconds, from a fast split to a long OCR run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Observations counted in cumulative buckets per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (the last one being +Inf), sum
+        self._values: Dict[Labels, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Span:
+    """Times one stage and collects the tokens spent in it; see ``Metrics.span``."""
+
+    enabled = True
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._parent: Optional[Span] = None
+        self._start = 0.0
+
+    def add_tokens(self, prompt: int = 0, completion: int = 0) -> None:
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+
+    def __enter__(self) -> "Span":
+        self._parent = _current_span.get()
+        _current_span.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._start
+        # Restored by value rather than with a token: a span opened in a
+        # generator may be closed from another context
+        _current_span.set(self._parent)
+        self.metrics.record(self.stage, elapsed, error=exc_type is not None and not issubclass(exc_type, GeneratorExit))
+        self.metrics.add_tokens(self.stage, self.prompt_tokens, self.completion_tokens)
+
+
+class _NestedSpan:
+    """A re-entered stage: tokens go to the enclosing span, which does the timing."""
+
+    enabled = True
+
+    def __init__(self, outer: Span):
+        self.outer = outer
+        self.stage = outer.stage
+
+    def add_tokens(self, prompt: int = 0, completion: int = 0) -> None:
+        self.outer.add_tokens(prompt, completion)
+
+    def __enter__(self) -> "_NestedSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+class _NoopSpan:
+    enabled = False
+    stage = None
+
+    def add_tokens(self, prompt: int = 0, completion: int = 0) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Metrics:
+    """A registry of counters, gauges and histograms, with the stage metrics built in."""
+
+    def __init__(self, namespace: str = "chatbot"):
+        self.namespace = namespace
+        self.enabled = False
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.stage_duration = self.histogram("stage_duration_seconds", "Time spent in each pipeline stage.")
+        self.stage_errors = self.counter("stage_errors_total", "Pipeline stage runs that raised an error.")
+        self.tokens = self.counter("llm_tokens_total", "LLM tokens spent per pipeline stage and token type.")
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    # Registration
+
+    def _register(self, cls, name: str, help: str, **kwargs):
+        name = f"{self.namespace}_{name}"
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, buckets=buckets)
+
+    # Stages
+
+    def span(self, stage: str):
+        """
+        Return a context manager timing ``stage``.
+
+        Inside a span of the same stage, the returned span only forwards its
+        tokens to the enclosing one.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        current = _current_span.get()
+        if current is not None and current.stage == stage:
+            return _NestedSpan(current)
+        return Span(self, stage)
+
+    def current_stage(self) -> Optional[str]:
+        """Return the stage of the innermost open span, if any."""
+        current = _current_span.get() if self.enabled else None
+        return current.stage if current is not None else None
+
+    def record(self, stage: str, seconds: float, error: bool = False) -> None:
+        """Record one run of ``stage`` timed outside of a span."""
+        if not self.enabled:
+            return
+        self.stage_duration.observe(seconds, stage=stage)
+        if error:
+            self.stage_errors.inc(stage=stage)
+
+    def add_tokens(self, stage: str, prompt: int = 0, completion: int = 0) -> None:
+        if not self.enabled:
+            return
+        if prompt:
+            self.tokens.inc(prompt, stage=stage, type="prompt")
+        if completion:
+            self.tokens.inc(completion, stage=stage, type="completion")
+
+    # Export
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            registered = list(self._metrics.values())
+        lines = []
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text else f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# The process-wide registry shared by both front ends
+metrics = Metrics()
+
+# Content type of ``Metrics.render()`` output
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware answering ``GET path`` with the metrics, ahead of the
+    wrapped app's routes (e.g. a catch-all serving a frontend).
+    """
+
+    def __init__(self, app, path: str = "/metrics", registry: Metrics = metrics):
+        self.app = app
+        self.path = path
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        body = self.registry.render().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", CONTENT_TYPE_LATEST.encode()), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body if scope["method"] == "GET" else b""})
@@ -0,0 +1,135 @@
+"""Background rendering of the animation scenes for the web apps.
+
+Videos are rendered ahead of time with ``animations/render_all.py`` and served
+from its media directory. A request for a video that is missing or out of
+date queues a render instead; concurrent requests for the same scene and
+quality share one job. Jobs are deduplicated within a process only, so with
+several server processes a scene may be rendered once per process.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from animations.render_all import (
+    QUALITY_PRESETS, SceneInfo, discover_scenes, is_up_to_date, load_manifest, manifest_key,
+    output_path, record_render, render_scene, scene_hash
+)
+
+QUEUED = "queued"
+RENDERING = "rendering"
+DONE = "done"
+FAILED = "failed"
+
+
+class RenderQueueFull(Exception):
+    """Raised when a render is requested while ``max_queued`` jobs are waiting."""
+
+
+@dataclass
+class RenderJob:
+    scene: SceneInfo
+    quality: str
+    status: str = QUEUED
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Duration of the scene's last render, to estimate progress from
+    expected_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    def progress(self) -> Optional[float]:
+        """Estimated fraction done, from the duration of the previous render."""
+        if self.status == DONE:
+            return 1.0
+        if self.status != RENDERING or not self.expected_seconds:
+            return 0.0 if self.status == QUEUED else None
+        return min((time.time() - self.started_at) / self.expected_seconds, 0.99)
+
+    def to_dict(self) -> dict:
+        return {
+            "scene": self.scene.name,
+            "quality": self.quality,
+            "status": self.status,
+            "progress": self.progress(),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class RenderQueue:
+    """
+    Renders scenes on ``max_workers`` threads, each waiting on a ``manim``
+    process, with at most ``max_queued`` jobs waiting for a thread.
+    """
+
+    def __init__(self, media_dir: str, default_quality: str = "medium", max_workers: int = 1, max_queued: int = 8):
+        if default_quality not in QUALITY_PRESETS:
+            raise ValueError(f"Unknown quality {default_quality!r}, expected one of {', '.join(QUALITY_PRESETS)}")
+        self.media_dir = media_dir
+        self.default_quality = default_quality
+        self.max_queued = max_queued
+        self.scenes: Dict[str, SceneInfo] = {scene.name: scene for scene in discover_scenes()}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        # Latest job per scene and quality, finished ones included
+        self._jobs: Dict[str, RenderJob] = {}
+        self._lock = threading.Lock()
+
+    def video_path(self, scene: SceneInfo, quality: str) -> Optional[str]:
+        """Return the path of the scene's video if it is rendered and up to date."""
+        if not is_up_to_date(scene, quality, load_manifest(self.media_dir), self.media_dir):
+            return None
+        return output_path(scene, quality, self.media_dir)
+
+    def job(self, scene: SceneInfo, quality: str) -> Optional[RenderJob]:
+        with self._lock:
+            return self._jobs.get(manifest_key(scene, quality))
+
+    def jobs(self) -> List[RenderJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def submit(self, scene: SceneInfo, quality: str) -> RenderJob:
+        """
+        Queue a render of ``scene``, or return the job already queued or
+        running for it.
+
+        :raises RenderQueueFull: If ``max_queued`` jobs are already waiting
+        """
+        key = manifest_key(scene, quality)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status in (QUEUED, RENDERING):
+                return job
+            if sum(job.status == QUEUED for job in self._jobs.values()) >= self.max_queued:
+                raise RenderQueueFull()
+            previous = load_manifest(self.media_dir).get(key)
+            job = RenderJob(scene, quality, submitted_at=time.time(), expected_seconds=previous and previous.get("seconds"))
+            self._jobs[key] = job
+        self._executor.submit(self._render, job)
+        return job
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _render(self, job: RenderJob) -> None:
+        with self._lock:
+            job.status = RENDERING
+            job.started_at = time.time()
+        try:
+            source_hash = scene_hash(job.scene, job.quality)
+            ok, output = render_scene(job.scene, job.quality, self.media_dir)
+            if ok:
+                with self._lock:
+                    record_render(job.scene, job.quality, source_hash, time.time() - job.started_at, self.media_dir)
+            error = None if ok else output[-2000:]
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            job.status = DONE if error is None else FAILED
+            job.error = error
+            job.finished_at = time.time()
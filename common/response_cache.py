@@ -0,0 +1,243 @@
+"""Exact and near-duplicate cache of chat replies.
+
+Questions are normalized (case, accents, punctuation, spacing) and looked up
+by exact key first. On a miss, the question is embedded as hashed character
+n-grams and compared with the cached questions of the same context, so that
+"What's the binomial theorem?" is answered from "what is the binomial
+theorem". Everything is in process memory and lookups take well under a
+millisecond.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.cache import hash_bytes
+from common.metrics import metrics
+
+Message = Dict[str, str]
+
+# Punctuation, except math symbols and decimal points
+_PUNCTUATION = re.compile(r"[^\w\s°+\-*/^=<>%.]|(?<!\d)\.|\.(?!\d)")
+_OPERATOR = re.compile(r"\s*([+*/^=<>%])\s*")
+_CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "how's": "how is", "why's": "why is", "where's": "where is",
+    "isn't": "is not", "don't": "do not", "doesn't": "does not", "can't": "cannot",
+}
+
+# Words that do not change what a question asks for
+_FILLER_WORDS = frozenset(
+    "a an the is are was were be been of to in on for and or what do does did can could would should "
+    "i me my we you your it its this that these those please explain define describe tell show give "
+    "about with by from as at mean means meaning".split()
+)
+# Minimum similarity of two spellings of the same word, e.g. "numbr" and "number"
+_WORD_SIMILARITY = 0.8
+
+_requests = metrics.counter("response_cache_requests_total", "Chat response cache lookups by result (exact, semantic or miss).")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase ``text``, strip accents and punctuation and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text.lower().replace("’", "'").replace("°", " degrees "))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = " ".join(_CONTRACTIONS.get(word, word) for word in text.split()).replace("'s ", " ")
+    text = _OPERATOR.sub(r" \1 ", _PUNCTUATION.sub(" ", text))
+    return " ".join(text.split())
+
+
+def content_words(normalized: str) -> Tuple[str, ...]:
+    """Return the words of a normalized question that carry its meaning."""
+    return tuple(sorted({word for word in normalized.split() if word not in _FILLER_WORDS}))
+
+
+def same_terms(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """
+    Return whether every content word of each question has a counterpart in
+    the other. Numbers and words of up to three letters (``sin``, ``cos``,
+    ``x``) must match exactly, longer words may differ by a typo.
+    """
+    return all(_has_counterpart(word, b) for word in a) and all(_has_counterpart(word, a) for word in b)
+
+
+def _has_counterpart(word: str, words: Tuple[str, ...]) -> bool:
+    if word in words:
+        return True
+    if len(word) <= 3 or any(c.isdigit() for c in word):
+        return False
+    return any(
+        len(other) > 3 and SequenceMatcher(None, word, other).ratio() >= _WORD_SIMILARITY
+        for other in words
+    )
+
+
+def conversation_context(messages: List[Message]) -> str:
+    """
+    Return the part of a conversation a new question's answer depends on: the
+    system messages (documents, earlier-conversation summary) and the last
+    reply, which a follow-up question may refer to.
+    """
+    parts = [m["content"] for m in messages if m["role"] == "system"]
+    replies = [m["content"] for m in messages if m["role"] == "assistant"]
+    if replies:
+        parts.append(replies[-1])
+    return "\n\n".join(parts)
+
+
+def embed(text: str, dim: int = 512, n: int = 3) -> np.ndarray:
+    """Embed normalized ``text`` as an L2-normalized vector of hashed word and character n-gram counts."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in text.split():
+        features = [f"w:{word}"]
+        padded = f" {word} "
+        features.extend(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            # The sign bit spreads collisions around zero instead of adding them up
+            vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class _Entry:
+    reply: str
+    context: str
+    terms: Tuple[str, ...]
+    expires: float
+    row: int
+
+
+class ResponseCache:
+    """
+    Cached replies by normalized question and context, with near-duplicate
+    matching, a TTL and least-recently-used eviction beyond ``max_entries``.
+
+    A near-duplicate only matches a question of the same context, with a
+    cosine similarity of at least ``threshold`` and the same content words up
+    to typos (see ``same_terms``), so that "what is 12 * 7" is never answered
+    with the reply to "what is 12 * 8", nor "derivative of sin x" with that
+    of "derivative of cos x".
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 24 * 3600, threshold: float = 0.75, dim: int = 512):
+        """
+        :param max_entries: Number of replies kept
+        :param ttl: Seconds a reply stays valid
+        :param threshold: Minimum cosine similarity of a near-duplicate
+            question (above 1 disables near-duplicate matching)
+        :param dim: Size of the question embeddings
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.dim = dim
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # One embedding row per entry, grown as needed; rows of evicted
+        # entries are reused
+        self._vectors = np.zeros((min(max_entries, 256), dim), dtype=np.float32)
+        self._free_rows = list(range(len(self._vectors) - 1, -1, -1))
+        # Context hash -> keys of the entries with that context
+        self._by_context: Dict[str, Dict[str, None]] = {}
+        self._lock = threading.Lock()
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+    def get(self, question: str, context: str = "") -> Optional[str]:
+        """Return the cached reply to ``question`` in ``context``, if any."""
+        normalized = normalize_question(question)
+        context_key = hash_bytes("context", context)
+        key = hash_bytes(context_key, normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live_entry(key, now)
+            result = "exact"
+            if entry is None and self.threshold <= 1:
+                entry = self._nearest(normalized, context_key, now)
+                result = "semantic"
+            if entry is None:
+                self.misses += 1
+                if metrics.enabled:
+                    _requests.inc(result="miss")
+                return None
+            self.hits[result] += 1
+            if metrics.enabled:
+                _requests.inc(result=result)
+            return entry.reply
+
+    def set(self, question: str, context: str, reply: str) -> None:
+        """Cache ``reply`` as the answer to ``question`` in ``context``."""
+        normalized = normalize_question(question)
+        context_key = hash_bytes("context", context)
+        key = hash_bytes(context_key, normalized)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            if not self._free_rows:
+                self._grow()
+            row = self._free_rows.pop()
+            self._vectors[row] = embed(normalized, self.dim)
+            self._entries[key] = _Entry(reply, context_key, content_words(normalized), time.monotonic() + self.ttl, row)
+            self._by_context.setdefault(context_key, {})[key] = None
+
+    def stats(self) -> dict:
+        """Return the hit and miss counts and the hit rate since start."""
+        with self._lock:
+            hits = sum(self.hits.values())
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.hits["exact"],
+                "semantic_hits": self.hits["semantic"],
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def _live_entry(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, normalized: str, context_key: str, now: float) -> Optional[_Entry]:
+        keys = list(self._by_context.get(context_key, ()))
+        if not keys:
+            return None
+        rows = np.fromiter((self._entries[key].row for key in keys), dtype=np.intp, count=len(keys))
+        scores = self._vectors[rows] @ embed(normalized, self.dim)
+        terms = content_words(normalized)
+        for i in np.argsort(scores)[::-1]:
+            if scores[i] < self.threshold:
+                break
+            entry = self._live_entry(keys[i], now)
+            if entry is not None and same_terms(entry.terms, terms):
+                return entry
+        return None
+
+    def _grow(self) -> None:
+        size = len(self._vectors)
+        new_size = min(size * 2, self.max_entries)
+        self._vectors = np.concatenate([self._vectors, np.zeros((new_size - size, self.dim), dtype=np.float32)])
+        self._free_rows.extend(range(new_size - 1, size - 1, -1))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._free_rows.append(entry.row)
+        keys = self._by_context[entry.context]
+        del keys[key]
+        if not keys:
+            del self._by_context[entry.context]
@@ -0,0 +1,80 @@
+"""In-memory lexical retrieval over document chunks."""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    A BM25 index over text chunks, scored with NumPy.
+
+    Chunks can be added at any time (e.g. one upload after another). Each
+    query only touches the postings of its own terms, so retrieval stays fast
+    for documents with thousands of chunks and needs no network access.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[str] = []
+        self.sources: List[str] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, chunks: Iterable[str], source: str = "") -> None:
+        """
+        Add chunks to the index.
+
+        :param chunks: The text chunks to index
+        :param source: Name of the document the chunks come from
+        """
+        for chunk in chunks:
+            doc_id = len(self.chunks)
+            terms = Counter(tokenize(chunk))
+            for term, count in terms.items():
+                self._postings[term].append((doc_id, count))
+            self.chunks.append(chunk)
+            self.sources.append(source)
+            self._lengths.append(sum(terms.values()))
+
+    def search(self, query: str, top_k: int = 4) -> List[Tuple[str, str]]:
+        """
+        Return the chunks most relevant to ``query``.
+
+        :param query: The user's question
+        :param top_k: Maximum number of chunks to return
+        :return: ``(source, chunk)`` pairs, best match first
+        """
+        if not self.chunks:
+            return []
+        lengths = np.asarray(self._lengths, dtype=np.float64)
+        avg_length = max(lengths.mean(), 1.0)
+        scores = np.zeros(len(self.chunks))
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            doc_ids, counts = np.asarray(postings, dtype=np.int64).T
+            idf = math.log(1 + (len(self.chunks) - len(postings) + 0.5) / (len(postings) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc_ids] / avg_length)
+            scores[doc_ids] += idf * counts * (self.k1 + 1) / (counts + norm)
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k == 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.sources[i], self.chunks[i]) for i in best]
@@ -0,0 +1,189 @@
+"""Rate-limit-aware, prioritized admission of outbound LLM requests."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from openai import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priority classes; lower values are admitted first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Longest a waiting request sleeps before checking again whether it may go
+_POLL_INTERVAL = 0.05
+
+
+class TokenBucket:
+    """A bucket of ``capacity`` units refilled continuously over one minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float, now: float) -> float:
+        """
+        Seconds until ``amount`` units can be taken while leaving ``reserve``
+        (a fraction of the capacity) in the bucket. Requests larger than the
+        whole bucket only wait until it is full.
+        """
+        self._refill(now)
+        needed = min(amount + reserve * self.capacity, self.capacity)
+        return max(needed - self.level, 0.0) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+class RateLimitScheduler:
+    """
+    Admits LLM requests within requests-per-minute and tokens-per-minute
+    budgets, highest priority first.
+
+    Waiting requests are ordered by priority class, then arrival. Only the
+    first one in that order may be admitted, so interactive requests overtake
+    any queued background work. Background requests additionally have to
+    leave ``background_reserve`` of each budget untouched, which keeps room
+    for interactive requests arriving during a burst of background work.
+
+    A 429 from the provider pauses all admissions and the request is retried
+    with exponential backoff and full jitter, honouring ``Retry-After``.
+
+    The budgets are those of this process only: with several processes
+    sharing an API key, give each one its share of the provider's limits
+    (the apps divide them by ``LLM_PROCESSES``).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        background_reserve: float = 0.2,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.background_reserve = background_reserve
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._paused_until = 0.0
+
+    # Admission
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        ticket = (priority, next(self._counter))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _try_admit(self, ticket: Tuple[int, int], tokens: int) -> float:
+        """Admit ``ticket`` and return 0, or return how long to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            if self._queue[0] != ticket:
+                return _POLL_INTERVAL
+            if now < self._paused_until:
+                return min(self._paused_until - now, _POLL_INTERVAL)
+            reserve = self.background_reserve if ticket[0] != INTERACTIVE else 0.0
+            wait = max(self.requests.wait_time(1, reserve, now), self.tokens.wait_time(tokens, reserve, now))
+            if wait > 0:
+                return min(wait, _POLL_INTERVAL)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            heapq.heappop(self._queue)
+            return 0.0
+
+    def _abandon(self, ticket: Tuple[int, int]) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def acquire(self, tokens: int, priority: int = INTERACTIVE) -> None:
+        """Block until a request of about ``tokens`` tokens may be sent."""
+        ticket = self._enqueue(priority)
+        try:
+            while (wait := self._try_admit(ticket, tokens)) > 0:
+                time.sleep(wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    async def aacquire(self, tokens: int, priority: int = INTERACTIVE) -> None:
+        """Async variant of ``acquire``."""
+        ticket = self._enqueue(priority)
+        try:
+            while (wait := self._try_admit(ticket, tokens)) > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    # Retries
+
+    def _backoff(self, attempt: int, error: RateLimitError) -> float:
+        """Pause admissions after a 429 and return how long to wait before retrying."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning(f"Rate limited by the LLM provider, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+    def run(self, call: Callable[[], T], tokens: int, priority: int = INTERACTIVE) -> T:
+        """
+        Run ``call`` once admitted, retrying it on rate-limit errors.
+
+        :param call: Function sending the request
+        :param tokens: Estimated tokens of the request (prompt + completion)
+        :param priority: ``INTERACTIVE`` or ``BACKGROUND``
+        """
+        for attempt in itertools.count():
+            self.acquire(tokens, priority)
+            try:
+                return call()
+            except RateLimitError as e:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    async def arun(self, call: Callable[[], Awaitable[T]], tokens: int, priority: int = INTERACTIVE) -> T:
+        """Async variant of ``run``."""
+        for attempt in itertools.count():
+            await self.aacquire(tokens, priority)
+            try:
+                return await call()
+            except RateLimitError as e:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    try:
+        return float(error.response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
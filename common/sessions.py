@@ -0,0 +1,102 @@
+"""Server-side storage for chat sessions."""
+
+import json
+import os
+import secrets
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from common.cache import Cache
+
+
+def new_session_id() -> str:
+    """Return a new random, URL-safe session id."""
+    return secrets.token_urlsafe(16)
+
+
+class SessionStore(ABC):
+    """Interface of the session backends: session id in, JSON-serializable dict out."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, data: dict) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions kept in this process's memory, evicting the least recently used
+    beyond ``max_sessions``. Fast, but only suitable for a single process.
+    """
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is not None:
+                self._sessions.move_to_end(session_id)
+            return data
+
+    def set(self, session_id: str, data: dict) -> None:
+        with self._lock:
+            self._sessions[session_id] = data
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Sessions stored as zlib-compressed JSON in an SQLite file.
+
+    The file can be shared by every worker process, so any worker can serve
+    any session. Once the stored sessions exceed ``max_bytes`` the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self._cache = Cache(path, max_bytes)
+
+    def get(self, session_id: str) -> Optional[dict]:
+        data = self._cache.get(session_id)
+        return None if data is None else json.loads(zlib.decompress(data))
+
+    def set(self, session_id: str, data: dict) -> None:
+        self._cache.set(session_id, zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8")))
+
+    def delete(self, session_id: str) -> None:
+        self._cache.delete(session_id)
+
+
+def create_session_store(backend: str, directory: str, max_bytes: int, max_sessions: int) -> SessionStore:
+    """
+    Create the session store selected by ``backend``.
+
+    :param backend: ``"sqlite"`` or ``"memory"``
+    :param directory: Directory of the SQLite file
+    :param max_bytes: Size cap of the SQLite store
+    :param max_sessions: Session count cap of the in-memory store
+    """
+    if backend == "sqlite":
+        return SqliteSessionStore(os.path.join(directory, "sessions.sqlite3"), max_bytes)
+    if backend == "memory":
+        return MemorySessionStore(max_sessions)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,114 @@
+"""Map-reduce summarization of long documents."""
+
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, Union
+
+from common.metrics import metrics
+
+# An async callable that turns a piece of text into its summary
+Summarizer = Callable[[str], Awaitable[str]]
+
+
+async def map_reduce_summarize(
+    chunks: Union[Iterable[str], AsyncIterable[str]],
+    summarize: Summarizer,
+    concurrency: int = 8,
+    fan_in: int = 8,
+    max_group_chars: int = 12000,
+) -> str:
+    """
+    Summarize a stream of text chunks with a bounded number of concurrent calls.
+
+    Every chunk is summarized in parallel (map). Chunks are pulled from
+    ``chunks`` only when a summarize slot is free, so a lazy producer (e.g. a
+    PDF being parsed page by page) is never more than ``concurrency`` chunks
+    ahead and summaries start before the whole document has been read.
+
+    The chunk summaries are then combined in groups of at most ``fan_in`` summaries / ``max_group_chars``
+    characters and summarized again, level by level, until a single summary
+    remains (tree reduce). Wall-clock time therefore grows with the depth of
+    the tree instead of the number of chunks, and no reduce call has to fit
+    every chunk summary into one prompt.
+
+    :param chunks: The text chunks to summarize, as an iterable or async iterable
+    :param summarize: Async function returning the summary of a text
+    :param concurrency: Maximum number of summarize calls in flight at once
+    :param fan_in: Maximum number of summaries combined by one reduce call
+    :param max_group_chars: Soft character limit for one reduce call's input
+    :return: A summary of the whole document, or ``""`` if there were no chunks
+    """
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2.")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(text: str) -> str:
+        async with semaphore:
+            return await summarize(text)
+
+    async def map_one(chunk: str) -> str:
+        try:
+            with metrics.span("map"):
+                return await summarize(chunk)
+        finally:
+            semaphore.release()
+
+    # Map: summarize every chunk, acquiring a slot before pulling the next one
+    tasks = []
+    try:
+        async for chunk in _aiter(chunks):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(map_one(chunk)))
+        summaries = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    if not summaries:
+        return ""
+    if len(summaries) == 1:
+        return summaries[0]
+    summaries = [f"Chunk {i+1} Summary: {summary}" for i, summary in enumerate(summaries)]
+
+    # Reduce: summarize groups of summaries until only one is left
+    while len(summaries) > 1:
+        groups = _group(summaries, fan_in, max_group_chars)
+        summaries = await asyncio.gather(*(_reduce(group, bounded) for group in groups))
+    return summaries[0]
+
+
+async def _aiter(chunks: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+
+async def _reduce(group: List[str], summarize: Summarizer) -> str:
+    # A trailing group with a single summary is carried to the next level as is
+    if len(group) == 1:
+        return group[0]
+    with metrics.span("reduce"):
+        return await summarize("\n\n".join(group))
+
+
+def _group(summaries: List[str], fan_in: int, max_chars: int) -> List[List[str]]:
+    """Pack consecutive summaries into groups for one reduce level.
+
+    A group is closed when it holds ``fan_in`` summaries or adding the next one
+    would exceed ``max_chars``. Groups always take at least two summaries so
+    that every level strictly shrinks.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for summary in summaries:
+        if current and (len(current) >= fan_in or (len(current) >= 2 and size + len(summary) > max_chars)):
+            groups.append(current)
+            current, size = [], 0
+        current.append(summary)
+        size += len(summary)
+    groups.append(current)
+    return groups
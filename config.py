@@ -5,3 +5,119 @@ SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
 
 # Babel settings
 LANGUAGES = ['en', 'fr']
+
+# Summarization settings
+# Maximum number of summary requests in flight for one document
+SUMMARY_CONCURRENCY = int(os.environ.get('SUMMARY_CONCURRENCY', 8))
+# Maximum number of partial summaries combined by one reduce step
+SUMMARY_FAN_IN = int(os.environ.get('SUMMARY_FAN_IN', 8))
+
+# Cache settings
+# Directory holding the on-disk caches (summaries, extracted text)
+CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+# Upper bound on the size of the cached values, least recently used first out
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Retrieval settings
+# Number of document chunks sent to the model with each question
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 4))
+
+# Conversation history settings
+# Token budget for the history sent with each chat request
+HISTORY_MAX_TOKENS = int(os.environ.get('HISTORY_MAX_TOKENS', 3000))
+# Number of most recent user/assistant turns that are never summarized
+HISTORY_MIN_TURNS = int(os.environ.get('HISTORY_MIN_TURNS', 2))
+
+# Document extraction settings
+# Number of worker processes parsing uploaded files (default: one per CPU)
+EXTRACT_WORKERS = int(os.environ['EXTRACT_WORKERS']) if os.environ.get('EXTRACT_WORKERS') else None
+# Seconds allowed for extracting the text of one file
+EXTRACT_TIMEOUT = float(os.environ.get('EXTRACT_TIMEOUT', 120))
+
+# CSV settings
+# Maximum number of CSV rows sent to the model with a question
+CSV_LOOKUP_ROWS = int(os.environ.get('CSV_LOOKUP_ROWS', 20))
+
+# Upload settings
+# Number of files of one message processed at the same time
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', 4))
+
+# OCR settings for scanned PDFs
+# Resolution scanned pages are rasterized at before OCR
+OCR_DPI = int(os.environ.get('OCR_DPI', 300))
+# Pages with less extracted text than this are OCR'd (0 disables OCR)
+OCR_MIN_CHARS = int(os.environ.get('OCR_MIN_CHARS', 10))
+
+# Chat session settings
+# Where /chat keeps conversations: 'sqlite' (shared by all worker processes,
+# under CACHE_DIR) or 'memory' (single process only)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite')
+# Size cap of the SQLite session store, least recently used sessions first out
+SESSION_MAX_BYTES = int(os.environ.get('SESSION_MAX_BYTES', 64 * 1024 * 1024))
+# Session count cap of the in-memory session store
+SESSION_MAX_COUNT = int(os.environ.get('SESSION_MAX_COUNT', 1000))
+
+# Upload limits for the Flask app
+# Largest accepted request body; bigger uploads are rejected with 413
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 50 * 1024 * 1024))
+# Uploads above this size are spooled to a temporary file instead of memory
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 1024 * 1024))
+
+# LLM gateway settings
+# Seconds allowed for an LLM response and for opening a connection
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+# Size of the pooled HTTP connections to the LLM API
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 100))
+# Provider rate limits the LLM requests are scheduled within, for all the
+# processes together
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get('LLM_REQUESTS_PER_MINUTE', 500))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get('LLM_TOKENS_PER_MINUTE', 40000))
+# Processes calling the LLM with the same key (every server worker, plus the
+# Chainlit app if it runs alongside). Each one schedules its requests within
+# an equal share of the limits, since the scheduler's budget is per process.
+LLM_PROCESSES = int(os.environ.get('LLM_PROCESSES', os.environ.get('SERVER_WORKERS', 1)))
+# Retries of a rate-limited (429) request, with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 5))
+# Share of both limits background summarization leaves free for chat
+LLM_BACKGROUND_RESERVE = float(os.environ.get('LLM_BACKGROUND_RESERVE', 0.2))
+
+# Metrics
+# Record per-stage latency and token metrics and serve them at /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Chat response cache
+# Replies kept for repeated questions (0 disables the cache), and for how
+# many seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 24 * 3600))
+# Minimum similarity for answering a reworded question from the cache
+# (above 1 only answers exact repeats)
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get('RESPONSE_CACHE_THRESHOLD', 0.75))
+
+# Document formats
+# Comma-separated modules registering additional file handlers, see
+# common/filetypes.py
+FILE_HANDLER_MODULES = [m for m in os.environ.get('FILE_HANDLER_MODULES', '').split(',') if m]
+
+# Production server (asgi.py)
+SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', 8000))
+# Server processes; each one serves many requests concurrently
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 1))
+# Seconds in-flight requests are given to finish on shutdown
+SERVER_GRACEFUL_TIMEOUT = float(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+
+# Animations
+# Directory of the rendered videos and their manifest, see
+# animations/render_all.py
+ANIMATIONS_MEDIA_DIR = os.environ.get('ANIMATIONS_MEDIA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media'))
+# Quality served when a request does not ask for one: low, medium, high,
+# production or 4k
+ANIMATION_QUALITY = os.environ.get('ANIMATION_QUALITY', 'medium')
+# Renders run at once, and renders allowed to wait, when a requested video
+# is missing
+ANIMATION_RENDER_WORKERS = int(os.environ.get('ANIMATION_RENDER_WORKERS', 1))
+ANIMATION_MAX_QUEUED = int(os.environ.get('ANIMATION_MAX_QUEUED', 8))
+# Seconds browsers may reuse a video before revalidating it
+ANIMATION_CACHE_MAX_AGE = int(os.environ.get('ANIMATION_CACHE_MAX_AGE', 3600))
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from animations.ant_walks import Graph, PathTable, hypercube_graph, polyhedron_graph
+
+
+def test_cube_paths():
+    table = PathTable(polyhedron_graph("cube"))
+    start, end = table.farthest_pair()
+    path = table.path(start, end)
+    assert len(path) == 4
+    assert table.distance(start, end) == pytest.approx(6.0)
+
+
+def test_hypercube_distances_are_hamming_distances():
+    table = PathTable(hypercube_graph(4))
+    hamming = np.array([[bin(i ^ j).count("1") for j in range(16)] for i in range(16)])
+    np.testing.assert_allclose(table.distances, hamming)
+
+
+@pytest.mark.parametrize("positions", [
+    [[0, 0], [1, 0], [5, 5]],
+    # Unequal edge lengths, searched with Floyd–Warshall
+    [[0, 0], [1, 0], [5, 5], [5, 7]],
+])
+def test_disconnected_graph(positions):
+    table = PathTable(Graph(np.array(positions, dtype=float), [(0, 1)] + ([(2, 3)] if len(positions) > 3 else [])))
+    assert table.path(0, 1) == [0, 1]
+    assert table.distance(0, 2) == np.inf
+    with pytest.raises(ValueError):
+        table.path(0, 2)
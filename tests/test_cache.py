@@ -0,0 +1,40 @@
+import time
+
+from common.cache import Cache, hash_bytes
+
+
+def test_get_and_set(tmp_path):
+    cache = Cache(str(tmp_path / "cache.sqlite3"))
+    key = hash_bytes("test", "a")
+    assert cache.get(key) is None
+    cache.set(key, "value")
+    assert cache.get(key) == "value"
+    cache.set(key, b"bytes")
+    assert cache.get(key) == b"bytes"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = Cache(str(tmp_path / "cache.sqlite3"), max_bytes=30)
+    for key in "abc":
+        cache.set(key, "x" * 10)
+        time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("d", "x" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+
+
+def test_values_over_budget_are_not_stored(tmp_path):
+    cache = Cache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    cache.set("a", "x" * 5)
+    cache.set("b", "x" * 11)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 5
+
+
+def test_cache_file_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    Cache(path).set("a", "value")
+    assert Cache(path).get("a") == "value"
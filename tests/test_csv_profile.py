@@ -0,0 +1,28 @@
+from common.csv_profile import lookup_csv_rows, profile_csv
+
+
+def write_csv(tmp_path, text, encoding="utf-8"):
+    path = tmp_path / "data.csv"
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_profile_describes_every_column(tmp_path):
+    rows = "".join(f"{name},{score}\n" for name, score in [("alice", 1), ("bob", 2), ("alice", 3), ("", 6)])
+    profile = profile_csv(write_csv(tmp_path, "name,score\n" + rows), chunk_rows=3)
+    lines = profile.splitlines()
+    assert lines[0] == "CSV profile: 4 rows, 2 columns (encoding: utf-8)"
+    assert lines[1] == "- name (text): 1 nulls, 2 distinct, top values: alice (2), bob (1)"
+    assert lines[2].startswith("- score (numeric): 0 nulls, 4 distinct, min 1, max 6, mean 3")
+
+
+def test_ragged_rows_and_empty_file(tmp_path):
+    assert profile_csv(write_csv(tmp_path, "")) == ""
+    profile = profile_csv(write_csv(tmp_path, "a,b\n1\n2,3,4\n"))
+    assert profile.startswith("CSV profile: 2 rows, 2 columns")
+
+
+def test_lookup_returns_the_header_and_best_rows(tmp_path):
+    path = write_csv(tmp_path, "city,country\nParis,France\nLyon,France\nBerlin,Germany\n")
+    assert lookup_csv_rows(path, "Which cities are in France?").splitlines() == ["city,country", "Paris,France", "Lyon,France"]
+    assert lookup_csv_rows(path, "Spain") is None
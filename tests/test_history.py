@@ -0,0 +1,63 @@
+import asyncio
+
+from common.history import ConversationMemory, count_message_tokens
+
+
+def conversation(turns, words=50, **kwargs):
+    memory = ConversationMemory(**kwargs)
+    for i in range(turns):
+        memory.append("user", f"question {i} " + "word " * words)
+        memory.append("assistant", f"answer {i} " + "word " * words)
+    return memory
+
+
+def test_nothing_is_folded_within_budget():
+    memory = conversation(2, max_tokens=10000)
+    assert memory._take_overflow() == []
+    assert len(memory.messages) == 4
+
+
+def test_oldest_turns_are_folded_down_to_the_target():
+    memory = conversation(10, max_tokens=500, target_ratio=0.75)
+    overflow = memory._take_overflow()
+    assert overflow[0]["content"].startswith("question 0")
+    assert count_message_tokens(memory.messages) <= 375
+    assert len(overflow) + len(memory.messages) == 20
+
+
+def test_recent_turns_and_system_messages_are_kept():
+    memory = ConversationMemory(max_tokens=50, min_recent_turns=2)
+    memory.append("system", "Document summary " + "word " * 100)
+    for i in range(4):
+        memory.append("user", f"question {i} " + "word " * 50)
+        memory.append("assistant", f"answer {i} " + "word " * 50)
+    overflow = memory._take_overflow()
+    # Over budget even so: only the two oldest turns may go
+    assert [m["content"].split()[:2] for m in overflow] == [["question", "0"], ["answer", "0"], ["question", "1"], ["answer", "1"]]
+    assert memory.messages[0]["role"] == "system"
+    assert len(memory.messages) == 5
+
+
+def test_fold_summarizes_the_overflow_with_the_previous_summary():
+    memory = conversation(10, max_tokens=500)
+    memory.summary = "earlier"
+    texts = []
+
+    async def summarize(text):
+        texts.append(text)
+        return "new summary"
+
+    asyncio.run(memory.afold(summarize))
+    assert memory.summary == "new summary"
+    assert texts[0].startswith("Summary of the conversation so far: earlier")
+    assert "user: question 0" in texts[0]
+    assert memory.to_messages()[0]["content"] == "Summary of the earlier conversation: new summary"
+
+
+def test_round_trip():
+    memory = conversation(2)
+    memory.summary = "summary"
+    restored = ConversationMemory.from_dict(memory.to_dict(), max_tokens=100)
+    assert restored.messages == memory.messages
+    assert restored.summary == "summary"
+    assert restored.max_tokens == 100
@@ -0,0 +1,25 @@
+from common.ingest import ChunkBuffer, iter_chunks
+
+
+def split_words(chunk_size):
+    def split(text):
+        words = text.split()
+        return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+    return split
+
+
+def test_chunks_are_emitted_once_two_chunks_are_buffered():
+    buffer = ChunkBuffer(split_words(5), chunk_size=10)
+    assert buffer.feed("a b c d e") == []
+    assert buffer.feed("") == []
+    chunks = buffer.feed("f g h i j k l m n")
+    assert chunks == ["a b c d e", "f g h i j"]
+    assert buffer.flush() == ["k l m n"]
+    assert buffer.flush() == []
+
+
+def test_iter_chunks_keeps_every_word_in_order():
+    pages = [" ".join(f"w{p}_{i}" for i in range(7)) for p in range(10)]
+    chunks = list(iter_chunks(pages, split_words(4), chunk_size=20))
+    assert " ".join(chunks).split() == " ".join(pages).split()
+    assert all(len(chunk.split()) <= 4 for chunk in chunks)
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from common.llm import LLMGateway
+
+
+def test_concurrent_identical_calls_share_one_request():
+    gateway = LLMGateway()
+    calls = []
+    start = threading.Barrier(4)
+
+    def call():
+        calls.append(1)
+        time.sleep(0.1)
+        return "reply"
+
+    results = []
+
+    def request():
+        start.wait()
+        results.append(gateway._single_flight("key", call))
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["reply"] * 4
+    assert len(calls) == 1
+    assert not gateway._in_flight
+    # Done requests are not reused
+    gateway._single_flight("key", call)
+    assert len(calls) == 2
+
+
+def test_single_flight_error_reaches_every_caller():
+    gateway = LLMGateway()
+    start = threading.Barrier(3)
+    errors = []
+
+    def call():
+        time.sleep(0.1)
+        raise ValueError("upstream failed")
+
+    def request():
+        start.wait()
+        try:
+            gateway._single_flight("key", call)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    assert not gateway._in_flight
+
+
+def test_async_identical_calls_share_one_request():
+    gateway = LLMGateway()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    async def main():
+        return await asyncio.gather(*(gateway._async_single_flight("key", call) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["reply"] * 5
+    assert len(calls) == 1
+    assert not gateway._async_in_flight
+
+
+def test_async_single_flight_error_reaches_every_caller():
+    gateway = LLMGateway()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def main():
+        return await asyncio.gather(*(gateway._async_single_flight("key", call) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not gateway._async_in_flight
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_request():
+    gateway = LLMGateway()
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    async def main():
+        first = asyncio.ensure_future(gateway._async_single_flight("key", call))
+        second = asyncio.ensure_future(gateway._async_single_flight("key", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "reply"
@@ -0,0 +1,54 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from common.metrics import CONTENT_TYPE_LATEST, Metrics, MetricsMiddleware
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_middleware_serves_metrics_ahead_of_catch_all_route():
+    registry = Metrics()
+    registry.enable()
+    with registry.span("split"):
+        pass
+    app = Starlette(routes=[Route("/{path:path}", lambda request: PlainTextResponse("frontend"))])
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    client = TestClient(app)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE_LATEST
+    assert 'chatbot_stage_duration_seconds_count{stage="split"} 1' in response.text
+    assert client.get("/chat").text == "frontend"
+    # Other methods reach the app, whose route only allows GET
+    assert client.post("/metrics").status_code == 405
+
+
+def test_chainlit_app_serves_metrics(tmp_path, monkeypatch):
+    # Chainlit writes its config files to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CHAINLIT_APP_ROOT", str(tmp_path))
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path / "cache"))
+    pytest.importorskip("chainlit")
+    from chainlit.server import app as chainlit_server
+
+    sys.path.insert(0, REPO_ROOT)
+    import config
+    monkeypatch.setattr(config, "METRICS_ENABLED", True)
+    # Loaded from its path, the way `chainlit run` does
+    spec = importlib.util.spec_from_file_location("chainlit_app", os.path.join(REPO_ROOT, "chainlit_chatbot", "app.py"))
+    chainlit_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(chainlit_app)
+
+    response = TestClient(chainlit_server).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE_LATEST
+    assert "chatbot_stage_duration_seconds" in response.text
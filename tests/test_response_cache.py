@@ -0,0 +1,43 @@
+import time
+
+from common.response_cache import ResponseCache, normalize_question
+
+
+def test_normalization():
+    assert normalize_question("  What's the   Binomial Théorème?! ") == "what is the binomial theoreme"
+    assert normalize_question("12*7") == "12 * 7"
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = ResponseCache()
+    cache.set("What is the binomial theorem?", "", "reply")
+    assert cache.get("what's the binomial theorem") == "reply"
+    assert cache.get("what is the binomal theorem") == "reply"
+    assert cache.hits == {"exact": 1, "semantic": 1}
+
+
+def test_near_duplicates_with_different_terms_are_rejected():
+    cache = ResponseCache()
+    cache.set("what is 12 * 7", "", "84")
+    cache.set("derivative of sin x", "", "cos x")
+    assert cache.get("what is 12*8") is None
+    assert cache.get("derivative of cos x") is None
+    assert cache.get("what is 12*7") == "84"
+
+
+def test_replies_are_per_context():
+    cache = ResponseCache()
+    cache.set("what does it mean", "document a", "reply a")
+    assert cache.get("what does it mean", "document b") is None
+    assert cache.get("what does it mean", "document a") == "reply a"
+
+
+def test_expiry_and_eviction():
+    cache = ResponseCache(max_entries=2, ttl=0.05)
+    cache.set("first question", "", "1")
+    cache.set("second question", "", "2")
+    cache.set("third question", "", "3")
+    assert cache.get("first question") is None
+    assert cache.get("third question") == "3"
+    time.sleep(0.06)
+    assert cache.get("third question") is None
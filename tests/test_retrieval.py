@@ -0,0 +1,24 @@
+from common.retrieval import BM25Index
+
+
+def test_best_matching_chunks_first():
+    index = BM25Index()
+    index.add(["The binomial theorem expands powers of a sum.", "Cats sleep most of the day."], source="a.pdf")
+    index.add(["Pascal's triangle gives the binomial coefficients of the theorem."], source="b.txt")
+    results = index.search("binomial theorem coefficients", top_k=4)
+    assert results[0] == ("b.txt", "Pascal's triangle gives the binomial coefficients of the theorem.")
+    assert [source for source, _ in results] == ["b.txt", "a.pdf"]
+    assert len(index) == 3
+
+
+def test_no_match():
+    index = BM25Index()
+    assert index.search("anything") == []
+    index.add(["alpha beta"])
+    assert index.search("gamma") == []
+
+
+def test_top_k():
+    index = BM25Index()
+    index.add([f"chunk {i} about triangles" for i in range(10)])
+    assert len(index.search("triangles", top_k=3)) == 3
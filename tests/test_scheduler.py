@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from common.scheduler import BACKGROUND, INTERACTIVE, RateLimitScheduler, TokenBucket
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://llm.test/v1/chat/completions"))
+    return RateLimitError("Rate limited", response=response, body=None)
+
+
+def test_bucket_waits_for_refill_and_keeps_reserve():
+    bucket = TokenBucket(60)
+    now = time.monotonic()
+    assert bucket.wait_time(60, 0.0, now) == 0
+    bucket.take(60)
+    # One unit per second
+    assert bucket.wait_time(1, 0.0, now) == pytest.approx(1.0, abs=0.01)
+    bucket.level = 30
+    assert bucket.wait_time(20, 0.0, now) == 0
+    # 20 units plus a reserve of 30% of 60 are needed
+    assert bucket.wait_time(20, 0.3, now) == pytest.approx(8.0, abs=0.01)
+    # Larger than the bucket: only waits until it is full
+    assert bucket.wait_time(1000, 0.0, now) == pytest.approx(30.0, abs=0.01)
+
+
+def test_interactive_request_overtakes_queued_background_work():
+    scheduler = RateLimitScheduler(600, 100000)
+    background = scheduler._enqueue(BACKGROUND)
+    interactive = scheduler._enqueue(INTERACTIVE)
+    assert scheduler._try_admit(background, 10) > 0
+    assert scheduler._try_admit(interactive, 10) == 0
+    assert scheduler._try_admit(background, 10) == 0
+
+
+def test_background_requests_leave_the_reserve_to_interactive_ones():
+    scheduler = RateLimitScheduler(600, 1000, background_reserve=0.2)
+    scheduler.tokens.level = 150
+    background = scheduler._enqueue(BACKGROUND)
+    # 100 tokens would leave less than the 200 kept in reserve
+    assert scheduler._try_admit(background, 100) > 0
+    scheduler._abandon(background)
+    interactive = scheduler._enqueue(INTERACTIVE)
+    assert scheduler._try_admit(interactive, 100) == 0
+    assert not scheduler._queue
+
+
+def test_acquire_waits_for_the_budget():
+    scheduler = RateLimitScheduler(600, 100000)
+    scheduler.requests.level = 0
+    start = time.monotonic()
+    scheduler.acquire(10)
+    # 10 requests per second: one is available after 0.1s
+    assert 0.08 <= time.monotonic() - start < 0.5
+
+
+def test_rate_limited_calls_are_retried_after_a_pause():
+    scheduler = RateLimitScheduler(600, 100000, base_delay=0.01, max_delay=0.01)
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert scheduler.run(call, 10) == "ok"
+    assert len(calls) == 3
+    assert scheduler._paused_until > 0
+
+
+def test_rate_limited_calls_give_up_after_max_retries():
+    scheduler = RateLimitScheduler(600, 100000, max_retries=2, base_delay=0.001)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise rate_limit_error()
+
+    with pytest.raises(RateLimitError):
+        scheduler.run(call, 10)
+    assert len(calls) == 3
+
+
+def test_backoff_honours_retry_after_and_pauses_admissions():
+    scheduler = RateLimitScheduler(600, 100000, base_delay=0.001, max_delay=0.001)
+    delay = scheduler._backoff(0, rate_limit_error("0.2"))
+    assert delay == pytest.approx(0.2)
+    ticket = scheduler._enqueue(INTERACTIVE)
+    assert scheduler._try_admit(ticket, 10) > 0
+    time.sleep(0.25)
+    assert scheduler._try_admit(ticket, 10) == 0
+
+
+def test_async_retries():
+    scheduler = RateLimitScheduler(600, 100000, base_delay=0.01, max_delay=0.01)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 2:
+            raise rate_limit_error()
+        return "ok"
+
+    assert asyncio.run(scheduler.arun(call, 10, BACKGROUND)) == "ok"
+    assert len(calls) == 2
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = RateLimitScheduler(600, 100000)
+    scheduler.requests.level = 0
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.aacquire(10), 0.01)
+
+    asyncio.run(main())
+    assert not scheduler._queue
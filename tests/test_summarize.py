@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from common.summarize import _group, map_reduce_summarize
+
+
+def test_groups_hold_at_most_fan_in_summaries():
+    assert _group(list("abcdefg"), 3, 1000) == [["a", "b", "c"], ["d", "e", "f"], ["g"]]
+
+
+def test_groups_close_at_max_chars_but_take_two_summaries():
+    summaries = ["x" * 60, "y" * 60, "z" * 10, "w" * 10]
+    assert _group(summaries, 8, 100) == [["x" * 60, "y" * 60], ["z" * 10, "w" * 10]]
+
+
+def summarize_counting(calls):
+    async def summarize(text):
+        calls.append(text)
+        return f"summary {len(calls)}"
+    return summarize
+
+
+def test_single_chunk_is_not_reduced():
+    calls = []
+    assert asyncio.run(map_reduce_summarize(["only chunk"], summarize_counting(calls))) == "summary 1"
+    assert calls == ["only chunk"]
+
+
+def test_no_chunks():
+    assert asyncio.run(map_reduce_summarize([], summarize_counting([]))) == ""
+
+
+def test_tree_reduce():
+    calls = []
+    result = asyncio.run(map_reduce_summarize([f"chunk {i}" for i in range(10)], summarize_counting(calls), fan_in=3))
+    # 10 maps, then 10 -> 4 (3 reduces, one carried) -> 2 (1 reduce, one carried) -> 1
+    assert len(calls) == 10 + 3 + 1 + 1
+    assert result == f"summary {len(calls)}"
+    assert calls[10].startswith("Chunk 1 Summary: ")
+
+
+def test_concurrency_is_bounded_and_async_chunks_are_pulled_lazily():
+    in_flight, peaks, pulled, done = [], [], [], []
+
+    async def chunks():
+        for i in range(20):
+            # One chunk is pulled while waiting for a free slot
+            assert len(pulled) - len(done) <= 3
+            pulled.append(i)
+            yield f"chunk {i}"
+
+    async def summarize(text):
+        in_flight.append(text)
+        peaks.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(text)
+        done.append(text)
+        return "summary"
+
+    asyncio.run(map_reduce_summarize(chunks(), summarize, concurrency=3))
+    assert max(peaks) == 3
+    assert len(pulled) == 20
+
+
+def test_fan_in_must_shrink_every_level():
+    with pytest.raises(ValueError):
+        asyncio.run(map_reduce_summarize(["a", "b"], summarize_counting([]), fan_in=1))